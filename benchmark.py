@@ -0,0 +1,410 @@
+# Description: Reproducible benchmark suite for DirectedGraph and UndirectedGraph.
+#
+# Builds seeded graphs of several shapes (random sparse, dense, power-law,
+# grid, DAG) at sizes from 10^2 to 10^6 vertices, times the public methods
+# on every storage class, records the peak memory of building each graph,
+# and prints the scaling of each method from one size to the next.
+#
+# Results can be saved as a JSON baseline and compared against later:
+#
+#   python benchmark.py --save baseline.json
+#   python benchmark.py --compare baseline.json      # exit status 1 on regressions
+#
+# Use --sizes / --quick / --backends / --shapes to run part of the suite.
+
+import argparse
+import json
+import math
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from d_graph import DirectedGraph, NumpyDirectedGraph, SparseDirectedGraph, np
+from ud_graph import InternedUndirectedGraph, UndirectedGraph
+
+SIZES = [100, 1000, 10000, 100000, 1000000]
+QUICK_SIZES = [100, 1000, 10000]
+SHAPES = ['sparse', 'dense', 'powerlaw', 'grid', 'dag']
+BACKENDS = ['dense', 'sparse', 'numpy', 'undirected', 'interned']
+
+# Adjacency matrices and dense shapes are O(V^2): above this many vertices
+# they are skipped rather than left to run out of memory.
+DENSE_LIMIT = 2000
+
+# Timings under this many seconds are too noisy to call a regression.
+NOISE_FLOOR = 0.001
+
+MAX_WEIGHT = 100
+
+
+# ---------------------------------------------------------------------- #
+# Graph generators. Each returns a list of (src, dst, weight) tuples over
+# vertices 0 .. n - 1, and is fully determined by its rng.
+
+def random_sparse(n: int, rng, degree=5) -> []:
+    """
+    n * degree edges between uniformly random vertices.
+    """
+    return [(rng.randrange(n), rng.randrange(n), rng.randint(1, MAX_WEIGHT)) for _ in range(n * degree)]
+
+
+def dense(n: int, rng, density=0.5) -> []:
+    """
+    Every ordered pair of distinct vertices is an edge with probability density.
+    """
+    return [(u, v, rng.randint(1, MAX_WEIGHT)) for u in range(n) for v in range(n)
+            if u != v and rng.random() < density]
+
+
+def power_law(n: int, rng, links=3) -> []:
+    """
+    Preferential attachment: each new vertex links to `links` earlier ones,
+    picked in proportion to their degree, so a few hubs get most edges.
+    """
+    edges = []
+    endpoints = list(range(min(n, links)))      # Every vertex once per edge it touches
+    for v in range(links, n):
+        for u in {rng.choice(endpoints) for _ in range(links)}:
+            edges.append((v, u, rng.randint(1, MAX_WEIGHT)))
+            endpoints.append(u)
+            endpoints.append(v)
+    return edges
+
+
+def grid(n: int, rng) -> []:
+    """
+    Square grid of about n vertices, with edges both ways between neighbours.
+    """
+    side = max(1, math.isqrt(n))
+    edges = []
+    for v in range(side * side):
+        row, column = divmod(v, side)
+        if column + 1 < side:
+            edges.append((v, v + 1, rng.randint(1, MAX_WEIGHT)))
+            edges.append((v + 1, v, rng.randint(1, MAX_WEIGHT)))
+        if row + 1 < side:
+            edges.append((v, v + side, rng.randint(1, MAX_WEIGHT)))
+            edges.append((v + side, v, rng.randint(1, MAX_WEIGHT)))
+    return edges
+
+
+def dag(n: int, rng, degree=5) -> []:
+    """
+    n * degree edges that all go from a smaller vertex to a larger one.
+    """
+    edges = []
+    for _ in range(n * degree if n > 1 else 0):
+        u = rng.randrange(n - 1)
+        edges.append((u, rng.randrange(u + 1, n), rng.randint(1, MAX_WEIGHT)))
+    return edges
+
+
+GENERATORS = {'sparse': random_sparse, 'dense': dense, 'powerlaw': power_law, 'grid': grid, 'dag': dag}
+
+
+def make_edges(shape: str, n: int, seed: int) -> []:
+    """
+    Returns the edges of the given shape and size. The same arguments
+    always give the same edges.
+    """
+    return GENERATORS[shape](n, random.Random(f"{shape}-{n}-{seed}"))
+
+
+# ---------------------------------------------------------------------- #
+# Backends. Each wraps one graph class behind the same small interface so
+# the operations below can be written once.
+
+class Backend:
+    """
+    A directed storage class under test.
+    """
+    directed = True
+
+    def __init__(self, name: str, graph_class):
+        self.name = name
+        self.graph_class = graph_class
+
+    def build(self, edges):
+        return self.graph_class.from_edges(edges)
+
+    def empty(self):
+        return self.graph_class()
+
+    def vertex(self, v):
+        return v
+
+    def add_vertex(self, graph, v) -> None:
+        graph.add_vertex()
+
+    def add_edge(self, graph, u, v, weight) -> None:
+        graph.add_edge(u, v, weight)
+
+
+class UndirectedBackend(Backend):
+    """
+    UndirectedGraph or a subclass, with vertex i named str(i) and weights dropped.
+    """
+    directed = False
+
+    def build(self, edges):
+        return self.graph_class.from_edges((str(u), str(v)) for u, v, _ in edges)
+
+    def vertex(self, v):
+        return str(v)
+
+    def add_vertex(self, graph, v) -> None:
+        graph.add_vertex(str(v))
+
+    def add_edge(self, graph, u, v, weight) -> None:
+        graph.add_edge(str(u), str(v))
+
+
+def make_backends(names: []) -> []:
+    backends = []
+    for name in names:
+        if name == 'dense':
+            backends.append(Backend('dense', DirectedGraph))
+        elif name == 'sparse':
+            backends.append(Backend('sparse', SparseDirectedGraph))
+        elif name == 'numpy':
+            if np is None:
+                print("numpy is not installed, skipping the numpy backend", file=sys.stderr)
+                continue
+            backends.append(Backend('numpy', NumpyDirectedGraph))
+        elif name == 'undirected':
+            backends.append(UndirectedBackend('undirected', UndirectedGraph))
+        elif name == 'interned':
+            backends.append(UndirectedBackend('interned', InternedUndirectedGraph))
+        else:
+            raise ValueError(f"unknown backend {name!r}")
+    return backends
+
+
+# ---------------------------------------------------------------------- #
+# Operations. Each takes (backend, graph, edges, n, rng) and returns the
+# callable to time; the graph is built before timing starts.
+
+def op_add_vertex(backend, graph, edges, n, rng):
+    def run():
+        g = backend.empty()
+        for v in range(n):
+            backend.add_vertex(g, v)
+    return run
+
+
+def op_add_edge(backend, graph, edges, n, rng):
+    def run():
+        g = backend.empty()
+        for v in range(n):
+            backend.add_vertex(g, v)
+        for u, v, weight in edges:
+            backend.add_edge(g, u, v, weight)
+    return run
+
+
+def op_get_edges(backend, graph, edges, n, rng):
+    return graph.get_edges
+
+
+def op_is_valid_path(backend, graph, edges, n, rng):
+    # Random walks along existing edges, so most paths are valid all the way
+    successors = {}
+    for u, v, _ in edges:
+        successors.setdefault(u, []).append(v)
+        if not backend.directed:
+            successors.setdefault(v, []).append(u)
+    starts = list(successors) or [0]
+    paths = []
+    for _ in range(1000):
+        path = [rng.choice(starts)]
+        while len(path) < 10 and path[-1] in successors:
+            path.append(rng.choice(successors[path[-1]]))
+        paths.append([backend.vertex(v) for v in path])
+
+    def run():
+        for path in paths:
+            graph.is_valid_path(path)
+    return run
+
+
+def op_dfs(backend, graph, edges, n, rng):
+    return lambda: graph.dfs(backend.vertex(0))
+
+
+def op_bfs(backend, graph, edges, n, rng):
+    return lambda: graph.bfs(backend.vertex(0))
+
+
+def op_bfs_levels(backend, graph, edges, n, rng):
+    return lambda: graph.bfs_levels(backend.vertex(0))
+
+
+def op_has_cycle(backend, graph, edges, n, rng):
+    return graph.has_cycle
+
+
+def op_count_connected_components(backend, graph, edges, n, rng):
+    if backend.directed:
+        return None
+
+    def run():
+        graph._components = None        # Time building the component index, not a cached count
+        graph.count_connected_components()
+    return run
+
+
+def op_dijkstra(backend, graph, edges, n, rng):
+    if not backend.directed:
+        return None
+    return lambda: graph.dijkstra(0)
+
+
+OPERATIONS = {
+    'add_vertex': op_add_vertex,
+    'add_edge': op_add_edge,
+    'get_edges': op_get_edges,
+    'is_valid_path': op_is_valid_path,
+    'dfs': op_dfs,
+    'bfs': op_bfs,
+    'bfs_levels': op_bfs_levels,
+    'has_cycle': op_has_cycle,
+    'count_connected_components': op_count_connected_components,
+    'dijkstra': op_dijkstra,
+}
+
+
+# ---------------------------------------------------------------------- #
+
+def time_call(run, repeat: int) -> float:
+    """
+    Returns the best wall time of repeat calls of run, in seconds.
+    """
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_suite(sizes, shapes, backends, operations, repeat=3, seed=0, dense_limit=DENSE_LIMIT, log=print) -> []:
+    """
+    Runs every operation on every backend, shape and size.
+    Returns a list of result dicts (backend, shape, n, op, seconds, peak_bytes).
+    peak_bytes is the peak traced memory while building the graph.
+    """
+    results = []
+    for shape in shapes:
+        for n in sizes:
+            if shape == 'dense' and n > dense_limit:
+                continue
+            edges = make_edges(shape, n, seed)
+
+            for backend in backends:
+                if backend.name in ('dense', 'numpy') and n > dense_limit:
+                    continue
+
+                tracemalloc.start()
+                graph = backend.build(edges)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+                for name in operations:
+                    run = OPERATIONS[name](backend, graph, edges, n, random.Random(f"{name}-{n}-{seed}"))
+                    if run is None:         # Not meaningful for this backend
+                        continue
+                    seconds = time_call(run, repeat)
+                    results.append({'backend': backend.name, 'shape': shape, 'n': n, 'op': name,
+                                    'seconds': seconds, 'peak_bytes': peak})
+                    log(f"{backend.name:>10} {shape:>8} {n:>8} {name:>26} {seconds:12.6f}s"
+                        f" {peak / 2 ** 20:10.1f} MiB")
+    return results
+
+
+def scaling(results: []) -> []:
+    """
+    Returns the empirical scaling exponent of each operation between
+    consecutive sizes: the slope of log(time) against log(n). About 1 is
+    linear, about 2 quadratic. Rows are (backend, shape, op, n_from, n_to, exponent).
+    """
+    series = {}
+    for result in results:
+        key = (result['backend'], result['shape'], result['op'])
+        series.setdefault(key, []).append((result['n'], result['seconds']))
+
+    rows = []
+    for key, points in sorted(series.items()):
+        points.sort()
+        for (n_from, t_from), (n_to, t_to) in zip(points, points[1:]):
+            if t_from > 0 and t_to > 0 and n_to > n_from:
+                rows.append((*key, n_from, n_to, math.log(t_to / t_from) / math.log(n_to / n_from)))
+    return rows
+
+
+def compare(results: [], baseline: [], tolerance: float) -> []:
+    """
+    Returns the results that got slower than tolerance times their baseline
+    timing, as (result, baseline seconds) pairs. Timings below NOISE_FLOOR
+    in both runs are ignored.
+    """
+    before = {(b['backend'], b['shape'], b['n'], b['op']): b['seconds'] for b in baseline}
+    regressions = []
+    for result in results:
+        old = before.get((result['backend'], result['shape'], result['n'], result['op']))
+        if old is None or max(old, result['seconds']) < NOISE_FLOOR:
+            continue
+        if result['seconds'] > old * tolerance:
+            regressions.append((result, old))
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark DirectedGraph and UndirectedGraph.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=None, help="vertex counts to run")
+    parser.add_argument('--quick', action='store_true', help=f"only run sizes {QUICK_SIZES}")
+    parser.add_argument('--shapes', nargs='+', default=SHAPES, choices=SHAPES)
+    parser.add_argument('--backends', nargs='+', default=BACKENDS, choices=BACKENDS)
+    parser.add_argument('--ops', nargs='+', default=list(OPERATIONS), choices=list(OPERATIONS))
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per measurement, best is kept")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--dense-limit', type=int, default=DENSE_LIMIT,
+                        help="largest graph for O(V^2) storage and the dense shape")
+    parser.add_argument('--save', metavar='JSON', help="write the results as a baseline")
+    parser.add_argument('--compare', metavar='JSON', help="compare against a saved baseline")
+    parser.add_argument('--tolerance', type=float, default=1.5,
+                        help="slowdown factor that counts as a regression")
+    args = parser.parse_args(argv)
+
+    sizes = args.sizes or (QUICK_SIZES if args.quick else SIZES)
+    results = run_suite(sizes, args.shapes, make_backends(args.backends), args.ops,
+                        args.repeat, args.seed, args.dense_limit)
+
+    print("\nScaling exponents (slope of log time vs log n):")
+    for backend, shape, op, n_from, n_to, exponent in scaling(results):
+        print(f"{backend:>10} {shape:>8} {op:>26} {n_from:>8} -> {n_to:<8} {exponent:6.2f}")
+
+    if args.save:
+        meta = {'python': platform.python_version(), 'platform': platform.platform(),
+                'seed': args.seed, 'repeat': args.repeat, 'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+        with open(args.save, 'w') as f:
+            json.dump({'meta': meta, 'results': results}, f, indent=1)
+        print(f"\nSaved {len(results)} results to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.tolerance)
+        print(f"\n{len(regressions)} regression(s) against {args.compare}")
+        for result, old in regressions:
+            print(f"{result['backend']:>10} {result['shape']:>8} {result['n']:>8} {result['op']:>26}"
+                  f" {old:10.6f}s -> {result['seconds']:10.6f}s")
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
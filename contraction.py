@@ -0,0 +1,244 @@
+# Description: Contraction hierarchies over DirectedGraph, for fast point to point queries.
+#
+# Building contracts the vertices one at a time, least important first.
+# Contracting v removes it from the remaining graph and, for each in
+# neighbour u and out neighbour w whose shortest path may run through v,
+# adds a shortcut u -> w. A vertex's rank is its place in that order.
+# Every shortest path then has an equally short path in the hierarchy that
+# goes up in rank and then down, so a query only needs a forward search
+# over upward edges and a backward search over downward ones, which both
+# stay in the small top of the hierarchy.
+
+import heapq
+import operator
+from array import array
+
+from d_graph import INF, PathResult
+
+
+class ContractionHierarchy:
+    """
+    Contraction hierarchy of a DirectedGraph (any of its storage classes).
+    - importance of a vertex: shortcuts its contraction would add, minus
+      the edges it would remove, plus its neighbours already contracted;
+      recomputed lazily when a vertex comes off the queue
+    - a shortcut u -> w is skipped when a witness search from u that avoids
+      v finds a path to w no longer than through v. The search stops after
+      witness_limit settled vertices, in which case the shortcut is added
+      anyway, which costs space but never correctness
+    - the result is stored as CSR arrays: upward edges for the forward
+      search, downward edges reversed for the backward search
+    The hierarchy is a copy: later changes to the graph are not seen.
+    version holds the graph's version when it was built.
+    """
+
+    def __init__(self, graph, witness_limit=64):
+        self.v_count = n = graph.v_count
+        self.version = graph._version
+        self.witness_limit = witness_limit
+        self.rank = array('q', [0]) * n
+        self.shortcuts = 0
+        self._middle = {}           # Key = (u, w) shortcut : Value = the vertex it skips
+
+        out = [dict(graph._out_edges(v)) for v in range(n)]     # Remaining graph
+        into = [{} for _ in range(n)]
+        for v in range(n):
+            for u, weight in out[v].items():
+                into[u][v] = weight
+        edges = [dict(successors) for successors in out]        # Every edge ever, shortcuts too
+
+        self._contract_all(out, into, edges)
+        self._up = _pack(n, ((v, u, w) for v in range(n) for u, w in edges[v].items()
+                             if self.rank[v] < self.rank[u]))
+        self._down = _pack(n, ((u, v, w) for v in range(n) for u, w in edges[v].items()
+                               if self.rank[v] > self.rank[u]))
+
+    def _contract_all(self, out, into, edges) -> None:
+        """
+        Contracts every vertex in order of importance, recording its rank
+        and adding its shortcuts to the remaining graph and to edges.
+        """
+        contracted_neighbours = [0] * self.v_count
+        pq = [(2 * len(self._shortcuts(v, out, into)) - len(out[v]) - len(into[v]), v)
+              for v in range(self.v_count)]
+        heapq.heapify(pq)
+        order = 0
+
+        while len(pq) != 0:
+            _, v = heapq.heappop(pq)
+            shortcuts = self._shortcuts(v, out, into)
+            importance = 2 * len(shortcuts) - len(out[v]) - len(into[v]) + contracted_neighbours[v]
+            if len(pq) != 0 and importance > pq[0][0]:    # Lazy update: no longer the least important
+                heapq.heappush(pq, (importance, v))
+                continue
+
+            self.rank[v] = order
+            order += 1
+            for u, w, weight in shortcuts:
+                out[u][w] = into[w][u] = edges[u][w] = weight
+                self._middle[(u, w)] = v
+            self.shortcuts += len(shortcuts)
+
+            for u in into[v]:
+                del out[u][v]
+                contracted_neighbours[u] += 1
+            for w in out[v]:
+                del into[w][v]
+                contracted_neighbours[w] += 1
+            out[v], into[v] = {}, {}
+
+    def _shortcuts(self, v: int, out, into) -> []:
+        """
+        Returns the (u, w, weight) shortcuts contracting v would need.
+        """
+        shortcuts = []
+        if len(out[v]) == 0:
+            return shortcuts
+        longest_out = max(out[v].values())
+
+        for u, in_weight in into[v].items():
+            reached = self._witness_search(u, v, in_weight + longest_out, out, out[v])
+            for w, out_weight in out[v].items():
+                if w != u and reached.get(w, INF) > in_weight + out_weight:
+                    shortcuts.append((u, w, in_weight + out_weight))
+        return shortcuts
+
+    def _witness_search(self, src: int, avoid: int, limit: int, out, targets) -> {}:
+        """
+        Dijkstra from src over the remaining graph without avoid, up to
+        distance limit, witness_limit settled vertices or every target
+        settled. Returns the distances found; each is the length of a real
+        path, so any of them no longer than the path through avoid is a
+        witness.
+        """
+        dist = {src: 0}
+        pq = [(0, src)]
+        settled = 0
+        unsettled = len(targets)
+        while len(pq) != 0 and settled < self.witness_limit and unsettled != 0:
+            d, v = heapq.heappop(pq)
+            if d > dist[v]:
+                continue
+            if d > limit:
+                break
+            settled += 1
+            if v in targets:
+                unsettled -= 1
+            for u, weight in out[v].items():
+                if u != avoid and d + weight < dist.get(u, INF):
+                    dist[u] = d + weight
+                    heapq.heappush(pq, (d + weight, u))
+        return dist
+
+    def distance(self, src: int, dst: int):
+        """
+        Returns the distance from src to dst, the same as
+        graph.dijkstra(src)[dst]: infinity if dst can't be reached.
+        """
+        return self.shortest_path(src, dst, unpack=False).distance
+
+    def shortest_path(self, src: int, dst: int, unpack=True) -> PathResult:
+        """
+        Returns a PathResult like DirectedGraph.shortest_path: distance,
+        the vertices of a shortest path in the original graph (shortcuts
+        unpacked, left empty with unpack=False), and the number of vertices
+        settled by the two upward searches.
+        """
+        try:
+            src, dst = operator.index(src), operator.index(dst)
+        except TypeError:
+            return PathResult(INF, [], 0)
+        if not (0 <= src < self.v_count and 0 <= dst < self.v_count):
+            return PathResult(INF, [], 0)
+
+        dist = ({src: 0}, {dst: 0})                 # Forward, backward
+        parent = ({src: None}, {dst: None})
+        pqs = ([(0, src)], [(0, dst)])
+        csrs = (self._up, self._down)
+        best, meet = (0, src) if src == dst else (INF, None)
+        settled = 0
+
+        while True:
+            # Each search may stop once its queue head can't beat best
+            head0 = pqs[0][0][0] if len(pqs[0]) != 0 else INF
+            head1 = pqs[1][0][0] if len(pqs[1]) != 0 else INF
+            if head0 >= best and head1 >= best:
+                break
+            side = 0 if head0 <= head1 else 1
+            this_dist, other_dist = dist[side], dist[1 - side]
+            d, v = heapq.heappop(pqs[side])
+            if d > this_dist[v]:
+                continue
+            settled += 1
+            if v in other_dist and d + other_dist[v] < best:
+                best, meet = d + other_dist[v], v
+
+            # Stall on demand: v isn't on a shortest path if a higher vertex reaches it shorter
+            offsets, targets, weights = csrs[1 - side]
+            start, end = offsets[v], offsets[v + 1]
+            if any(this_dist.get(u, INF) + weight < d
+                   for u, weight in zip(targets[start:end], weights[start:end])):
+                continue
+
+            offsets, targets, weights = csrs[side]
+            start, end = offsets[v], offsets[v + 1]
+            for u, weight in zip(targets[start:end], weights[start:end]):
+                if d + weight < this_dist.get(u, INF):
+                    this_dist[u] = d + weight
+                    parent[side][u] = v
+                    heapq.heappush(pqs[side], (d + weight, u))
+
+        if meet is None:
+            return PathResult(INF, [], settled)
+        if not unpack:
+            return PathResult(best, [], settled)
+
+        hops = []                                   # src .. meet, then meet .. dst
+        v = meet
+        while v is not None:
+            hops.append(v)
+            v = parent[0][v]
+        hops.reverse()
+        v = parent[1][meet]
+        while v is not None:
+            hops.append(v)
+            v = parent[1][v]
+
+        path = [src]
+        for a, b in zip(hops, hops[1:]):
+            self._unpack(a, b, path)
+        return PathResult(best, path, settled)
+
+    def _unpack(self, a: int, b: int, path: []) -> None:
+        """
+        Appends the original vertices after a up to b of the hierarchy edge
+        a -> b, replacing each shortcut by the two edges it stands for.
+        """
+        stack = [(a, b)]
+        while len(stack) != 0:
+            x, y = stack.pop()
+            middle = self._middle.get((x, y))
+            if middle is None:          # Original edge
+                path.append(y)
+            else:
+                stack.append((middle, y))
+                stack.append((x, middle))
+
+
+def _pack(v_count: int, edges) -> ():
+    """
+    Packs (row, target, weight) triples into CSR arrays (offsets, targets,
+    weights) grouped by row.
+    """
+    rows = [[] for _ in range(v_count)]
+    for row, target, weight in edges:
+        rows[row].append((target, weight))
+
+    offsets = array('q', [0])
+    targets, weights = array('q'), array('q')
+    for row in rows:
+        for target, weight in row:
+            targets.append(target)
+            weights.append(weight)
+        offsets.append(len(targets))
+    return offsets, targets, weights
@@ -4,7 +4,63 @@
 # Description: Directed graph class and associated methods.
 
 import heapq
-from collections import deque
+import multiprocessing
+import operator
+import os
+import random
+from array import array
+from bisect import bisect_left
+from collections import deque, namedtuple
+from contextlib import contextmanager
+from itertools import repeat
+
+import graph_cache
+import graph_io
+import graph_stats
+
+try:
+    import numpy as np
+except ImportError:     # NumPy is optional, only NumpyDirectedGraph needs it
+    np = None
+
+INF = float('inf')
+
+# dijkstra(method='auto') uses Dial's buckets up to this maximum edge weight
+# and a radix heap above it.
+DIAL_MAX_WEIGHT = 255
+
+# bfs_levels, here and in ud_graph, switches to bottom-up steps when the
+# frontier's out edges are more than 1 / BFS_ALPHA of the edges left to
+# check, and back to top-down once the frontier stops growing and is below
+# 1 / BFS_BETA of the vertices.
+BFS_ALPHA, BFS_BETA = 15, 18
+
+# Vertex colours for _three_colour_dfs
+WHITE, GREY, BLACK = 0, 1, 2
+
+# Result of a point to point search: total distance, list of vertices from
+# source to destination, and the number of vertices the search settled.
+PathResult = namedtuple('PathResult', ['distance', 'path', 'settled'])
+
+
+def _zero(v) -> int:
+    """
+    Default astar heuristic.
+    """
+    return 0
+
+
+def _walk_back(predecessor: dict, v: int) -> []:
+    """
+    Follows a predecessor map from v back to the root of the search.
+    Returns the vertices from v to the root.
+    """
+    path = []
+    while v is not None:
+        path.append(v)
+        v = predecessor[v]
+    return path
+
 
 class DirectedGraph:
     """
@@ -15,6 +71,54 @@ class DirectedGraph:
     - vertex names are integers
     """
 
+    # Public methods timed by enable_stats(), and the storage primitives
+    # whose calls it counts as expanded vertices and scanned edges
+    _INSTRUMENTED = ('add_vertex', 'add_edge', 'remove_edge', 'get_edges', 'is_valid_path',
+                     'validate_paths', 'dfs', 'bfs', 'bfs_levels', 'has_cycle', 'topological_sort',
+                     'strongly_connected_components', 'dijkstra', 'all_pairs_shortest_paths',
+                     'shortest_path', 'astar', 'prepare_landmarks', 'predecessors', 'in_degree',
+                     'snapshot', 'apply_batch')
+    _EXPANDING = ('_successors', '_successors_desc', '_out_edges', '_in_edges',
+                  '_predecessors', '_predecessors_desc', '_indexed_in_edges')
+
+    # Successor lists of each row, built on first use and dropped when the
+    # row changes: per vertex None or (ascending, descending, out edges)
+    _row_cache = None
+
+    # Predecessor index, built by the first predecessors(), in_degree() or
+    # reverse=True query and maintained by the mutating methods after that:
+    # per vertex a dict of source : weight
+    _in_index = None
+
+    # Sorted rows of the predecessor index, kept alongside it and dropped
+    # when the row changes: per vertex None or (ascending, descending, in edges)
+    _in_rows = None
+
+    # ALT tables from prepare_landmarks: (graph version, landmarks,
+    # distances from each landmark, distances to each landmark)
+    _landmarks = None
+
+    # (graph version, _max_weight result) from the last scan of the weights
+    _max_weight_cache = None
+
+    _query_cache = None     # QueryCache while caching is enabled
+    _version = 0            # Incremented by every change to the graph
+
+    # True for snapshots, which share storage with the graph they were
+    # taken from and so can't change
+    _read_only = False
+
+    # Rows this graph has copied since it last shared its storage with a
+    # snapshot, or None if it shares nothing
+    _owned_rows = None
+
+    # Edge changes queued inside batch(), or None outside of one
+    _pending = None
+
+    _stats = None                               # GraphStats while stats are enabled
+    _heappush = staticmethod(heapq.heappush)    # Replaced by counting versions
+    _heappop = staticmethod(heapq.heappop)      # while stats are enabled
+
     def __init__(self, start_edges=None):
         """
         Store graph info as adjacency matrix
@@ -53,25 +157,178 @@ class DirectedGraph:
 
     # ------------------------------------------------------------------ #
 
+    @classmethod
+    def from_edges(cls, edges):
+        """
+        Builds a graph from (src, dst, weight) tuples, like cls(edges) does,
+        but allocates every vertex up front and validates and stores each
+        edge in one pass, instead of calling add_vertex and add_edge.
+        Gives the same graph as cls(edges): the vertices are 0 up to the
+        largest vertex named, invalid edges are skipped, and an edge that
+        appears twice keeps its last weight.
+        """
+        sources, targets, weights = array('q'), array('q'), []     # Checked by from_arrays
+        for u, v, weight in edges:
+            sources.append(u)
+            targets.append(v)
+            weights.append(weight)
+        return cls.from_arrays(sources, targets, weights)
+
+    @classmethod
+    def from_arrays(cls, src, dst, weight=None):
+        """
+        Builds a graph from parallel sequences of edge sources, destinations
+        and weights (lists, array('q'), NumPy arrays...). Every weight is 1
+        if weight is None. Same rules as from_edges. Iterators are accepted
+        too, and read into lists first. NumPy integers are stored as int.
+        """
+        src, dst = _as_sequence(src), _as_sequence(dst)
+        weight = repeat(1) if weight is None else _as_sequence(weight)
+
+        v_count = max(0, max(src, default=0), max(dst, default=0)) + 1
+        graph = cls._with_vertices(v_count)
+        for u, v, w in zip(src, dst, weight):
+            if type(w) is not int:
+                w = _integer_weight(w)
+                if w is None:
+                    continue
+            if w >= 1 and u != v and u >= 0 and v >= 0:     # Same checks as add_edge
+                graph._set_weight(u, v, w)
+
+        return graph
+
+    def ingest(self, source, chunk_size=65536, delimiter=None, progress=None, names=None) -> int:
+        """
+        Streams edges from source into the graph, chunk_size edges at a time,
+        so the whole edge list is never held in memory at once.
+        source is anything graph_io.read_edge_chunks accepts: a path or text
+        file with one "src dst [weight]" edge per line (whitespace separated,
+        or pass delimiter=',' for CSV), or an iterable of lines or of
+        (src, dst[, weight]) rows. A missing weight is 1.
+        Vertices are added as needed. Invalid edges are skipped as in add_edge.
+        If names is a dict, the vertex fields are names rather than numbers:
+        each new name gets the next integer vertex, and the dict is filled
+        in with name : vertex as the edges arrive.
+        progress, if given, is called after each chunk with the number of
+        edges read so far. Returns the number of edges read.
+        """
+        total = 0
+
+        for rows in graph_io.read_edge_chunks(source, chunk_size, delimiter):
+            sources, targets, weights = array('q'), array('q'), array('q')
+            for row in rows:
+                if len(row) == 2:
+                    u, v = row
+                    weight = 1
+                elif len(row) == 3:
+                    u, v, weight = row
+                else:
+                    raise ValueError(f"expected 2 or 3 fields per edge, got {row!r}")
+                weight = int(weight) if isinstance(weight, str) else _integer_weight(weight)
+                if weight is None:          # Not an integer: skipped as in add_edge
+                    continue
+
+                if names is None:
+                    sources.append(int(u))
+                    targets.append(int(v))
+                else:
+                    sources.append(names.setdefault(u, len(names)))
+                    targets.append(names.setdefault(v, len(names)))
+                weights.append(weight)
+
+            self._grow_to(max(self.v_count, max(sources, default=-1) + 1, max(targets, default=-1) + 1))
+            for u, v, weight in zip(sources, targets, weights):
+                self.add_edge(u, v, weight)
+
+            total += len(rows)
+            if progress is not None:
+                progress(total)
+
+        return total
+
+    def enable_stats(self, callback=None) -> None:
+        """
+        Starts collecting statistics on this graph: calls and wall time of
+        each public method, vertices expanded, edges scanned, heap pushes
+        and pops, and stale heap entries skipped (see graph_stats.GraphStats).
+        callback, if given, is called after every public method call with
+        (method name, seconds, counters of that call).
+        Until this is called the graph runs without any instrumentation.
+        """
+        self.disable_stats()
+        graph_stats.instrument(self, graph_stats.GraphStats(callback), self._INSTRUMENTED, self._EXPANDING)
+
+    def disable_stats(self) -> None:
+        """
+        Stops collecting statistics and drops the ones collected.
+        """
+        graph_stats.uninstrument(self, self._INSTRUMENTED, self._EXPANDING)
+
+    def stats(self) -> dict:
+        """
+        Returns a snapshot of the statistics collected since enable_stats(),
+        or None if stats are not enabled.
+        """
+        if self._stats is None:
+            return None
+        return self._stats.snapshot()
+
+    def enable_cache(self, max_entries=1024, max_bytes=None) -> None:
+        """
+        Starts caching the results of dfs, bfs, bfs_levels, dijkstra,
+        shortest_path, has_cycle, topological_sort and
+        strongly_connected_components, keyed by method and arguments.
+        A cached result is only served while the graph is unchanged; the
+        least recently used ones are evicted past max_entries results or
+        max_bytes bytes (see graph_cache.QueryCache).
+        Cached lists are shared between callers, so don't modify them.
+        """
+        self._query_cache = graph_cache.QueryCache(max_entries, max_bytes)
+
+    def disable_cache(self) -> None:
+        """
+        Stops caching and drops the cached results.
+        """
+        self._query_cache = None
+
+    def cache_info(self) -> dict:
+        """
+        Returns the hit and miss counts and size of the query cache,
+        or None if caching is not enabled.
+        """
+        if self._query_cache is None:
+            return None
+        return self._query_cache.info()
+
+    def snapshot(self):
+        """
+        Returns a read-only copy of the graph as it is now, for readers on
+        other threads while this graph keeps changing. The snapshot shares
+        the edge storage, so taking one only copies the per-vertex row
+        references; afterwards this graph copies a row before it first
+        changes it, and the snapshot never sees the change.
+        Any number of threads can query a snapshot without locks. Changing
+        it raises TypeError. For other processes, save() the snapshot and
+        load() the file memory mapped.
+        """
+        if self._read_only:
+            return self
+
+        graph = self._share()
+        graph._version = self._version
+        graph._landmarks = self._landmarks
+        graph._read_only = True
+        return graph
+
     def add_vertex(self) -> int:
         """
         Adds a new vertex to the graph.
         Name of the vertex will be the next available int (starting from 0)
         Vertices are stored in an adjacency matrix.
         """
-        vertices = len(self.adj_matrix)
-        new_vertex = []
-
-        for vertex in range(vertices + 1):  # +1 to include itself
-            new_vertex.append(0)
-
-        for u in self.adj_matrix:
-            u.append(0)                     # Add a cell to all other vertices for the new vertex
+        self._grow_to(self.v_count + 1)
 
-        self.adj_matrix.append(new_vertex)  # Add the new vertex to the list
-        self.v_count += 1
-
-        return vertices + 1                 # Total amount of vertices in graph
+        return self.v_count                 # Total amount of vertices in graph
 
     def add_edge(self, src: int, dst: int, weight=1) -> None:
         """
@@ -80,15 +337,24 @@ class DirectedGraph:
         or src == dst, the method does nothing.
         If the edge already exists, this method updates its weight.
         """
-        if weight < 1 or src == dst or src < 0 or dst < 0:
+        if self._pending is not None:       # Inside batch(): applied when it ends
+            self._pending.append(('add', src, dst, weight))
+            return
+        weight = _integer_weight(weight)
+        if weight is None or weight < 1 or src == dst or src < 0 or dst < 0:
             return
-        elif len(self.adj_matrix) <= src or \
-             len(self.adj_matrix) <= dst:    # Check to see if src or dst are not in the graph
+        elif self.v_count <= src or \
+             self.v_count <= dst:            # Check to see if src or dst are not in the graph
             return
+        src, dst = operator.index(src), operator.index(dst)     # No NumPy scalars in the storage
 
-        src_list = self.adj_matrix[src]      # Get the list of edges for the source
+        self._writable()
+        self._set_weight(src, dst, weight)   # Add the weight to the storage
+        self._version += 1
 
-        src_list[dst] = weight               # Add the weight to the matrix
+        if self._in_index is not None:
+            self._in_index[dst][src] = weight
+            self._in_rows[dst] = None
 
     def remove_edge(self, src: int, dst: int) -> None:
         """
@@ -96,21 +362,99 @@ class DirectedGraph:
         If either vertex does not exist,
         or the edge does not exist, the method does nothing.
         """
+        if self._pending is not None:       # Inside batch(): applied when it ends
+            self._pending.append(('remove', src, dst))
+            return
         if src < 0 or dst < 0:
             return
-        elif len(self.adj_matrix) <= src or \
-           len(self.adj_matrix) <= dst:  # Check to see if src or dst are not in the graph
+        elif self.v_count <= src or \
+           self.v_count <= dst:  # Check to see if src or dst are not in the graph
             return
 
-        src_list = self.adj_matrix[src]  # Get the list of edges for the source
+        self._writable()
+        self._set_weight(src, dst, 0)  # 0 is no edge, thus remove the edge
+        self._version += 1
 
-        src_list[dst] = 0  # 0 is no edge, thus remove the edge
+        if self._in_index is not None:
+            self._in_index[dst].pop(src, None)
+            self._in_rows[dst] = None
+
+    def apply_batch(self, ops) -> int:
+        """
+        Applies a batch of edge changes and leaves the graph as calling
+        add_edge and remove_edge for each op in order would. Each op is a
+        tuple ('add', src, dst[, weight]) or ('remove', src, dst), or the
+        same as a string: 'add 0 1 5', 'remove 0 1'. A missing weight is 1.
+        Invalid edges are skipped as add_edge and remove_edge skip them,
+        and only the last op on each edge counts, so an edge added and
+        removed again within the batch is never stored. The ops are all
+        parsed before anything changes, so a malformed one (ValueError)
+        leaves the graph untouched. The remaining changes are then written
+        in one pass, and the version and predecessor index are updated
+        once. Returns the number of edges written after coalescing.
+        """
+        v_count = self.v_count
+        final = {}                          # Key = (src, dst) : Value = last weight, 0 to remove
+        for op in ops:
+            command, src, dst, weight = _parse_edge_op(op)
+            if src == dst or not (0 <= src < v_count and 0 <= dst < v_count):
+                continue
+            if command == 'remove':
+                final[(src, dst)] = 0
+            else:
+                weight = _integer_weight(weight)
+                if weight is not None and weight >= 1:
+                    final[(src, dst)] = weight
+
+        if len(final) == 0:
+            return 0
+        changes = [(src, dst, weight) for (src, dst), weight in final.items()]
+
+        self._writable()
+        self._set_weights(changes)
+        self._version += 1
+
+        if self._in_index is not None:
+            for src, dst, weight in changes:
+                if weight == 0:
+                    self._in_index[dst].pop(src, None)
+                else:
+                    self._in_index[dst][src] = weight
+                self._in_rows[dst] = None
+        return len(changes)
+
+    @contextmanager
+    def batch(self):
+        """
+        Context manager that queues every add_edge and remove_edge call made
+        inside it and hands them to apply_batch when it ends:
+
+            with graph.batch():
+                graph.add_edge(0, 1, 5)
+                graph.remove_edge(2, 3)
+
+        Queries inside the block see the graph as it was before the block;
+        adding a vertex applies the changes queued so far first. If the
+        block raises, the queued changes are dropped. A nested batch()
+        joins the outer one.
+        """
+        if self._pending is not None:
+            yield self
+            return
+
+        self._pending = []
+        try:
+            yield self
+            ops = self._pending
+        finally:
+            self._pending = None
+        self.apply_batch(ops)
 
     def get_vertices(self) -> []:
         """
         Returns a list of the vertices in the graph in ascending order.
         """
-        return [x for x in range(len(self.adj_matrix))]
+        return [x for x in range(self.v_count)]
 
     def get_edges(self) -> []:
         """
@@ -121,14 +465,9 @@ class DirectedGraph:
         List is ordered by vertex value in ascending order.
         """
         edges = []
-        v_i = 0
-        for v in self.adj_matrix:
-            u_i = 0
-            for edge in v:
-                if edge != 0:
-                    edges.append((v_i, u_i, edge))
-                u_i += 1
-            v_i += 1
+        for v in range(self.v_count):
+            for u, weight in self._out_edges(v):
+                edges.append((v, u, weight))
 
         return edges
 
@@ -137,143 +476,391 @@ class DirectedGraph:
         This method takes a list of vertices.
         It then checks to ensure the path is valid by checking that
         all vertices exist, and if so, checking that each edge exists.
+        Each step is one edge lookup, so this is O(len(path)).
         """
-        if len(path) == 0:  # Empty path is valid
-            return True
+        return self._path_validator()(path)
 
-        if path[0] < 0 or path[0] > len(self.get_vertices()):  # Ensure the first vertex is valid
-            return False
-
-        v = None
+    def validate_paths(self, paths) -> []:
+        """
+        Returns a list of is_valid_path(path) for each path in paths.
+        The lookups are bound once for the whole batch rather than per path.
+        """
+        is_valid = self._path_validator()
+        return [is_valid(path) for path in paths]
 
-        for u in path:
-            if v is None:   # Assign our start point and continue
-                v = u
-                continue
+    def _path_validator(self):
+        """
+        Helper method for is_valid_path and validate_paths.
+        Returns a function checking one path against the graph as it is now.
+        """
+        has_vertex, weight = self._has_vertex, self._weight
 
-            if u < 0 or u > len(self.get_vertices()):   # Ensure u is a valid vertex
+        def is_valid(path) -> bool:
+            if len(path) == 0:      # Empty path is valid
+                return True
+            if not has_vertex(path[0]):     # Ensure the first vertex is valid
                 return False
-            elif self.adj_matrix[v][u] == 0:            # If the edge value is 0, there is no edge
-                return False                            #   Thus the path is invalid
-            v = u
 
-        return True
+            v = path[0]
+            for i in range(1, len(path)):
+                u = path[i]
+                if not has_vertex(u) or weight(v, u) == 0:  # A weight of 0 means there is no edge
+                    return False
+                v = u
+            return True
 
+        return is_valid
 
-    def dfs(self, v_start, v_end=None) -> []:
+    @graph_cache.cached
+    def dfs(self, v_start, v_end=None, reverse=False) -> []:
         """
         Return list of vertices visited during DFS search
         Vertices are picked in ascending numerical order
         If the starting vertex is not in the list, it will return an empty list.
         If the ending vertex is not in the list, it performs the DFS
         as if the end point is None.
+        With reverse=True, edges are followed backwards (from predecessors),
+        giving the vertices that can reach v_start.
         """
-        if v_start not in self.get_vertices():  # Check to see if the first vertex is in the graph
-            return []
+        return list(self.iter_dfs(v_start, v_end, reverse))
 
-        v_visited = []
-        stack = deque()
+    @graph_cache.cached
+    def bfs(self, v_start, v_end=None, reverse=False) -> []:
+        """
+        Return list of vertices visited during BFS search
+        Vertices are picked in ascending numerical order
+        If the starting vertex is not in the list, it will return an empty list.
+        If the ending vertex is not in the list, it performs the BFS
+        as if the end point is None.
+        With reverse=True, edges are followed backwards, as in dfs.
+        """
+        return list(self.iter_bfs(v_start, v_end, reverse))
 
-        stack.append(v_start)
+    def iter_dfs(self, v_start, v_end=None, reverse=False):
+        """
+        Generator version of dfs. Yields the vertices in the same order dfs
+        returns them, so a caller that stops early skips the rest of the search.
+        Visited vertices are tracked in a bytearray indexed by vertex.
+        """
+        if not self._has_vertex(v_start):   # Check to see if the first vertex is in the graph
+            return
+
+        successors_desc = self._predecessors_desc if reverse else self._successors_desc
+        visited = bytearray(self.v_count)
+        stack = [v_start]
 
         while len(stack) != 0:
             v = stack.pop()
             if v == v_end:
-                v_visited.append(v)
-                return v_visited
-
-            if v not in v_visited:  # If v hasn't been visited, push it to the stack, and
-                v_visited.append(v)  # then push it's neighbours too (in ascending order)
-                adjacent = self.adj_matrix[v]
-                # Edges are represented as weight values, but we care about the destination vertex.
-                # So we convert our list to be one of the connected destinations rather than weights.
-                adjacent_vs = [x for x in range(len(adjacent)) if adjacent[x] != 0]
-                adjacent_vs.sort()
-                adjacent_vs = adjacent_vs[::-1]  # Ensure we explore in ascending numerical order
-                for u in adjacent_vs:
-                    stack.append(u)
+                yield v
+                return
 
-        return v_visited
+            if not visited[v]:      # If v hasn't been visited, visit it, and
+                visited[v] = 1      # then push its unvisited neighbours (in ascending order)
+                yield v
+                for u in successors_desc(v):    # Descending, so the smallest is popped first
+                    if not visited[u]:
+                        stack.append(u)
 
-    def bfs(self, v_start, v_end=None) -> []:
+    def iter_bfs(self, v_start, v_end=None, reverse=False):
         """
-        Return list of vertices visited during DFS search
-        Vertices are picked in alphabetical order
-        If the starting vertex is not in the list, it will return an empty list.
-        If the ending vertex is not in the list, it performs the BFS
-        as if the end point is None.
+        Generator version of bfs. Yields the vertices in the same order bfs
+        returns them, so a caller that stops early skips the rest of the search.
+        Vertices are marked when queued, so each one is queued at most once.
         """
-        if v_start not in self.get_vertices():  # Check to see if the first vertex is in the graph
-            return []
+        if not self._has_vertex(v_start):   # Check to see if the first vertex is in the graph
+            return
 
-        v_visited = []
+        successors = self._predecessors if reverse else self._successors
+        queued = bytearray(self.v_count)
+        queued[v_start] = 1
         queue = deque()
-
         queue.append(v_start)
 
         while len(queue) != 0:
             v = queue.popleft()
+            yield v
             if v == v_end:
-                v_visited.append(v)
-                return v_visited
+                return
 
-            if v not in v_visited:  # If v hasn't been visited, push it to the stack, and
-                v_visited.append(v)  # then push it's neighbours too (in ascending order)
-                adjacent = self.adj_matrix[v]
-                # Edges are represented as weight values, but we care about the destination vertex.
-                # So we convert our list to be one of the connected destinations rather than weights.
-                adjacent_vs = [x for x in range(len(adjacent)) if adjacent[x] != 0]
-                adjacent_vs.sort()
-                for u in adjacent_vs:
-                    if u not in v_visited:
-                        queue.append(u)
+            for u in successors(v):     # Ascending order
+                if not queued[u]:
+                    queued[u] = 1
+                    queue.append(u)
 
-        return v_visited
+    @graph_cache.cached
+    def bfs_levels(self, v_start, order=False, numpy=False):
+        """
+        Level-synchronous BFS from v_start. Returns a list giving, for every
+        vertex, the number of edges on a shortest path from v_start to it
+        (infinity if it can't be reached).
+        Each level is expanded either top-down (frontier vertices look at
+        their successors) or bottom-up (unvisited vertices look through
+        their predecessors for one in the frontier, stopping at the first),
+        whichever checks fewer edges, see BFS_ALPHA and BFS_BETA. Bottom-up
+        steps read the predecessor index.
+        With order=True, returns (levels, the list bfs(v_start) returns).
+        That needs bfs order within each level, so every step is top-down.
+        With numpy=True, the steps work on whole frontiers of NumPy arrays
+        over the CSR form of the graph (requires numpy).
+        """
+        if not self._has_vertex(v_start):
+            return ([INF] * self.v_count, []) if order else [INF] * self.v_count
+        if numpy and not order:
+            return self._numpy_bfs_levels(v_start)
+
+        successors, out_degree = self._successors, self._out_degree
+        dist = [INF] * self.v_count
+        dist[v_start] = 0
+        frontier = [v_start]
+        visit = [v_start]
+        unvisited = None            # Built by the first bottom-up step
+        edges_to_check = sum(out_degree(v) for v in range(self.v_count))
+        depth = 0
+
+        while len(frontier) != 0:
+            scout_count = sum(out_degree(v) for v in frontier)
+
+            if not order and scout_count > edges_to_check / BFS_ALPHA:
+                if unvisited is None:
+                    unvisited = [v for v in range(self.v_count) if dist[v] == INF]
+                while True:         # Bottom-up steps while the frontier is large
+                    old_size = len(frontier)
+                    frontier, unvisited = self._bottom_up_step(dist, unvisited, depth)
+                    depth += 1
+                    if len(frontier) == 0 or (len(frontier) < old_size and
+                                              len(frontier) <= self.v_count / BFS_BETA):
+                        break
+                continue
 
-    def has_cycle(self):
+            edges_to_check -= scout_count
+            next_frontier = []
+            for v in frontier:      # Top-down step
+                for u in successors(v):
+                    if dist[u] == INF:
+                        dist[u] = depth + 1
+                        next_frontier.append(u)
+            visit.extend(next_frontier)
+            frontier = next_frontier
+            depth += 1
+
+        return (dist, visit) if order else dist
+
+    def _bottom_up_step(self, dist: [], unvisited: [], depth: int) -> ():
+        """
+        Helper method for bfs_levels. Every vertex of unvisited with a
+        predecessor at distance depth joins the next frontier.
+        Returns the next frontier and the vertices still unvisited.
+        """
+        index = self._predecessor_index()     # Any order will do, so skip the sorting
+        next_frontier = []
+        still_unvisited = []
+        for v in unvisited:
+            if dist[v] != INF:      # Reached by a top-down step since the list was made
+                continue
+            for u in index[v]:
+                if dist[u] == depth:
+                    dist[v] = depth + 1
+                    next_frontier.append(v)
+                    break
+            else:
+                still_unvisited.append(v)
+        return next_frontier, still_unvisited
+
+    def _numpy_bfs_levels(self, v_start: int) -> []:
         """
-        Uses helper method mod_dfs.
-        Investigates paths of the graph, keeping track of the current traversal.
-        If the dfs re-encounters a vertex that is in the current traversal, then
-        we have found a cycle.
-        Additionally, ensures every vertex has been visited to ensure this works
-        with disjointed graphs.
+        Helper method for bfs_levels, NumPy version. Same switching rule,
+        each step done on whole arrays: top-down gathers the CSR rows of
+        the frontier, bottom-up tests every edge still leading into an
+        unvisited vertex at once, then drops the edges into vertices it
+        reached, so the edges left to test shrink every step.
         """
-        v_unvisited = self.get_vertices()
-        vertices = self.get_vertices()
+        if np is None:
+            raise ImportError("bfs_levels(numpy=True) requires numpy")
+
+        offsets, targets, _ = (np.asarray(a, dtype=np.int64) for a in self.to_csr())
+        degrees = np.diff(offsets)
+        pending = None              # (sources, targets) of edges into unvisited vertices
+
+        dist = np.full(self.v_count, -1, dtype=np.int64)
+        dist[v_start] = 0
+        frontier = np.array([v_start], dtype=np.int64)
+        edges_to_check = len(targets)
+        depth = 0
+
+        while len(frontier) != 0:
+            scout_count = int(degrees[frontier].sum())
+            if scout_count > edges_to_check / BFS_ALPHA:
+                if pending is None:
+                    pending = (np.repeat(np.arange(self.v_count), degrees), targets)
+                while True:         # Bottom-up steps while the frontier is large
+                    old_size = len(frontier)
+                    keep = dist[pending[1]] < 0
+                    pending = (pending[0][keep], pending[1][keep])
+                    reached = np.zeros(self.v_count, dtype=bool)
+                    reached[pending[1][dist[pending[0]] == depth]] = True
+                    frontier = np.flatnonzero(reached)
+                    dist[frontier] = depth + 1
+                    depth += 1
+                    if len(frontier) == 0 or (len(frontier) < old_size and
+                                              len(frontier) <= self.v_count / BFS_BETA):
+                        break
+                continue
 
-        if len(vertices) < 3:
-            return False
+            edges_to_check -= scout_count
+            reached = _gather_rows(offsets, targets, frontier)    # Top-down step
+            frontier = np.unique(reached[dist[reached] < 0])
+            dist[frontier] = depth + 1
+            depth += 1
 
-        # When checking a graph for cycles, we need to check
-        # all components of the graph. Thus, we ensure we visit each
-        # vertex through our BFS, by doing a BFS on each component.
-        # If any component has a cycle, then the this method returns true
+        return [INF if d < 0 else d for d in dist.tolist()]
 
-        while len(v_unvisited) > 0:
-            has_cycle, visited = self.mod_dfs(v_unvisited[0])
-            if has_cycle:
-                return True
-            for v in visited:
-                if v in v_unvisited:
-                    v_unvisited.remove(v)
+    def predecessors(self, v: int) -> []:
+        """
+        Returns the vertices with an edge to v, in ascending order.
+        If v is not in the graph, returns an empty list.
+        The first call builds a predecessor index, which add_edge,
+        remove_edge and add_vertex then keep up to date.
+        """
+        if not self._has_vertex(v):
+            return []
+        return list(self._predecessors(v))     # A copy: the cached row is shared
 
+    def in_degree(self, v: int) -> int:
+        """
+        Returns the number of edges into v, 0 if v is not in the graph.
+        Uses the same predecessor index as predecessors.
+        """
+        if not self._has_vertex(v):
+            return 0
+        return len(self._predecessor_index()[v])
 
+    @graph_cache.cached
+    def has_cycle(self):
+        """
+        Uses helper method _three_colour_dfs.
+        Runs a DFS from every unvisited vertex, colouring vertices white
+        (unvisited), grey (on the current DFS path) or black (finished).
+        If the dfs reaches a grey vertex, the path loops back on itself,
+        so we have found a cycle. O(V + E).
+        """
+        _, cyclic = self._three_colour_dfs(stop_on_cycle=True)
+        return cyclic
 
-        return False
+    @graph_cache.cached
+    def topological_sort(self) -> []:
+        """
+        Returns the vertices in topological order: for every edge u -> v,
+        u comes before v. Ties are broken by DFS in ascending numerical order.
+        Returns None if the graph has a cycle, since then there is no such order.
+        """
+        postorder, cyclic = self._three_colour_dfs(stop_on_cycle=True)
+        if cyclic:
+            return None
+        return postorder[::-1]      # Reverse postorder of a DAG is a topological order
 
+    @graph_cache.cached
+    def strongly_connected_components(self) -> []:
+        """
+        Returns the strongly connected components of the graph as lists of
+        vertices (each in ascending order). Components are listed in
+        topological order of the graph of components, so no edge leads
+        from a later component to an earlier one.
+        Iterative Tarjan's algorithm, O(V + E) with no recursion.
+        """
+        index = [-1] * self.v_count     # DFS discovery number of each vertex
+        low = [0] * self.v_count        # Smallest index reachable from its DFS subtree
+        on_stack = bytearray(self.v_count)
+        stack = []                      # Vertices whose component isn't known yet
+        components = []
+        counter = 0
+
+        for root in range(self.v_count):
+            if index[root] != -1:
+                continue
+            index[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = 1
+            work = [(root, iter(self._successors(root)))]   # DFS path, with where each vertex is up to
+
+            while len(work) != 0:
+                v, successors = work[-1]
+                for u in successors:
+                    if index[u] == -1:      # Tree edge, go down
+                        index[u] = low[u] = counter
+                        counter += 1
+                        stack.append(u)
+                        on_stack[u] = 1
+                        work.append((u, iter(self._successors(u))))
+                        break
+                    elif on_stack[u]:
+                        low[v] = min(low[v], index[u])
+                else:                       # v is finished
+                    work.pop()
+                    if len(work) != 0:
+                        parent = work[-1][0]
+                        low[parent] = min(low[parent], low[v])
+                    if low[v] == index[v]:  # v is the root of a component
+                        component = []
+                        while True:
+                            u = stack.pop()
+                            on_stack[u] = 0
+                            component.append(u)
+                            if u == v:
+                                break
+                        component.sort()
+                        components.append(component)
+
+        components.reverse()                # Tarjan finds sink components first
+        return components
+
+    def _three_colour_dfs(self, stop_on_cycle=False) -> ():
+        """
+        Helper method for has_cycle and topological_sort.
+        Iterative DFS over the whole graph, roots and successors taken in
+        ascending numerical order. Each stack frame keeps an iterator over
+        its vertex's successors, so every edge is looked at once.
+        Returns the vertices in postorder, and whether a back edge (a cycle)
+        was found. With stop_on_cycle, returns as soon as one is.
+        """
+        colour = bytearray(self.v_count)    # WHITE, GREY or BLACK
+        postorder = []
+        cyclic = False
+
+        for root in range(self.v_count):
+            if colour[root] != WHITE:
+                continue
+            colour[root] = GREY
+            stack = [(root, iter(self._successors(root)))]
+
+            while len(stack) != 0:
+                v, successors = stack[-1]
+                for u in successors:
+                    if colour[u] == WHITE:
+                        colour[u] = GREY
+                        stack.append((u, iter(self._successors(u))))
+                        break
+                    elif colour[u] == GREY:     # u is on the current path: back edge
+                        cyclic = True
+                        if stop_on_cycle:
+                            return postorder, True
+                else:                           # Every successor is done
+                    stack.pop()
+                    colour[v] = BLACK
+                    postorder.append(v)
+
+        return postorder, cyclic
 
     def mod_dfs(self, v_start):
         """
-        Helper method for has_cycle.
         Modified DFS which returns both the paths visited, but also if the
         path we checked contained a cycle.
+        This was the helper of has_cycle, which now uses _three_colour_dfs.
         """
-        if len(self.adj_matrix) < 3:
+        if self.v_count < 3:
             return False
 
-        v_start = v_start
-
         v_visited = []
         stack = deque()
         current_traversal = deque()
@@ -295,12 +882,7 @@ class DirectedGraph:
 
             if v not in v_visited:
                 v_visited.append(v)
-                adjacent = self.adj_matrix[v]
-                # Edges are represented as weight values, but we care about the destination vertex.
-                # So we convert our list to be one of the connected destinations rather than weights.
-                adjacent_vs = [x for x in range(len(adjacent)) if adjacent[x] != 0]
-                adjacent_vs.sort()
-                adjacent_vs = adjacent_vs[::-1]  # Ensure we explore in ascending numerical order
+                adjacent_vs = self._successors_desc(v)  # Ensure we explore in ascending numerical order
                 if len(adjacent_vs) != 0:
                     backTracking = False
                     for u in adjacent_vs:
@@ -319,41 +901,1196 @@ class DirectedGraph:
 
         return False, v_visited
 
-    def dijkstra(self, src: int) -> []:
+    @graph_cache.cached
+    def dijkstra(self, src: int, method='heap', reverse=False) -> []:
         """
         Implements Dijkstra's algorithm via hash map and priority queue.
         Returns a list of minimum distances for each vertex from the src vertex.
         Unreachable vertices have a distance of infinity.
+        Since weights are positive integers, the priority queue can be:
+        - 'heap': binary heap (heapq)
+        - 'dial': Dial's bucket queue, one bucket per distance value
+        - 'radix': radix heap, buckets by highest differing bit
+        - 'auto': 'dial' when the largest weight is at most DIAL_MAX_WEIGHT,
+          'radix' otherwise, and 'heap' if any weight isn't an integer
+        All of them return the same distances. 'dial' and 'radix' raise
+        ValueError on a graph with a weight that isn't an integer.
+        With reverse=True, edges are followed backwards: the result is the
+        distance from each vertex to src.
         """
-        v_visited = {}  # Key = vertex : Value = min distance to vertex
+        max_weight = None
+        if method in ('auto', 'dial', 'radix'):
+            max_weight = self._max_weight()
+            if max_weight is None and method != 'auto':
+                raise ValueError(f"dijkstra method {method!r} needs integer weights")
+        if method == 'auto':
+            if max_weight is None:
+                method = 'heap'
+            else:
+                method = 'dial' if max_weight <= DIAL_MAX_WEIGHT else 'radix'
+
+        edges_of = self._indexed_in_edges if reverse else self._out_edges
+        if method == 'heap':
+            v_dist = self._heap_distances(src, edges_of)
+        elif method == 'dial':
+            v_dist = self._dial_distances(src, max_weight, edges_of)
+        elif method == 'radix':
+            v_dist = self._radix_distances(src, edges_of)
+        else:
+            raise ValueError(f"unknown dijkstra method {method!r}")
+
+        cumulative_distances = [INF for x in range(self.v_count)]  # Initialize all vertices as inf
+        for vertex in v_dist:
+            cumulative_distances[vertex] = v_dist[vertex]
+
+        return cumulative_distances
+
+    def _heap_distances(self, src: int, edges_of) -> {}:
+        """
+        Helper method for dijkstra, binary heap version.
+        edges_of(v) gives the (vertex, weight) edges to relax from v.
+        Returns a dict of vertex : min distance for every reachable vertex.
+        A vertex is only pushed when its tentative distance improves, and
+        heap entries that have since been beaten are skipped when popped.
+        """
+        heappush, heappop = self._heappush, self._heappop
+        v_dist = {src: 0}   # Key = vertex : Value = best distance to vertex found so far
         pq = []    # Initialize priority queue
-        heapq.heappush(pq, (0, src))    # Values are pushed as tuples (priority/distance, vertex)
+        heappush(pq, (0, src))    # Values are pushed as tuples (priority/distance, vertex)
+        stale = 0
 
         while len(pq) != 0:
-            tup = heapq.heappop(pq)
-            d = tup[0]
-            v = tup[1]
-            if v not in v_visited:
-                v_visited[v] = d        # Add it to the dictionary
+            d, v = heappop(pq)
+            if d > v_dist[v]:           # Stale entry, v was settled with a shorter distance
+                stale += 1
+                continue
 
-                adjacent = self.adj_matrix[v]
-                adjacent_vs = [x for x in range(len(adjacent)) if adjacent[x] != 0]
-                adjacent_vs.sort()      # Get the adjacent vertexes
-                for direct_successor in adjacent_vs:
-                    d_i = adjacent[direct_successor]    # get the distance val of the edge
-                    cumulative_d = d + d_i              # Cumulative distance is the distance to v + distance of edge
-                    heapq.heappush(pq, (cumulative_d, direct_successor))
+            for direct_successor, d_i in edges_of(v):   # d_i is the distance val of the edge
+                cumulative_d = d + d_i              # Cumulative distance is the distance to v + distance of edge
+                if cumulative_d < v_dist.get(direct_successor, INF):
+                    v_dist[direct_successor] = cumulative_d
+                    heappush(pq, (cumulative_d, direct_successor))
 
-        cumulative_distances = [float('inf') for x in range(len(self.get_vertices()))]  # Initialize all vertices as inf
-        for vertex in v_visited:
-            cumulative_distances[vertex] = v_visited[vertex]
+        if self._stats is not None:
+            self._stats.count('stale_entries', stale)
+        return v_dist
 
-        return cumulative_distances
+    def _dial_distances(self, src: int, max_weight: int, edges_of) -> {}:
+        """
+        Helper method for dijkstra, Dial's algorithm.
+        Keeps max_weight + 1 buckets used circularly: every tentative distance
+        lies within max_weight of the one being settled, so bucket d % size
+        only ever holds vertices at distance d. Buckets hold bare vertices;
+        an entry is stale if the vertex has since moved to a smaller distance.
+        """
+        size = max_weight + 1
+        buckets = [None] * size     # Empty buckets are None, lists are made on demand
+        buckets[0] = [src]
+        v_dist = {src: 0}
+        pending = 1         # Entries (stale or not) still in the buckets
+        stale = 0
+        d = 0
+
+        while pending != 0:
+            bucket = buckets[d % size]
+            if bucket is not None:
+                buckets[d % size] = None    # Weights are >= 1, so nothing is added back to this bucket
+                pending -= len(bucket)
+                for v in bucket:
+                    if v_dist[v] != d:      # Stale entry
+                        stale += 1
+                        continue
+                    for u, weight in edges_of(v):
+                        if d + weight < v_dist.get(u, INF):
+                            v_dist[u] = d + weight
+                            i = (d + weight) % size
+                            if buckets[i] is None:
+                                buckets[i] = [u]
+                            else:
+                                buckets[i].append(u)
+                            pending += 1
+            d += 1
+
+        if self._stats is not None:
+            self._stats.count('stale_entries', stale)
+        return v_dist
+
+    def _radix_distances(self, src: int, edges_of) -> {}:
+        """
+        Helper method for dijkstra, radix heap.
+        Bucket i holds vertices whose distance first differs from the last
+        settled distance at bit i - 1 (bucket 0: equal to it). Popping from
+        an empty bucket 0 takes the lowest non-empty bucket, makes its
+        minimum the new last distance and spreads it over the lower buckets.
+        Each vertex moves down at most once per bit, so a pop is O(log C)
+        amortised. Buckets hold bare vertices keyed by their current distance.
+        """
+        v_dist = {src: 0}
+        settled = bytearray(self.v_count)
+        buckets = [[src]]
+        last = 0
+        stale = 0
+
+        while True:
+            if len(buckets[0]) == 0:
+                i = 1
+                while i < len(buckets) and len(buckets[i]) == 0:
+                    i += 1
+                if i == len(buckets):       # Every bucket is empty
+                    if self._stats is not None:
+                        self._stats.count('stale_entries', stale)
+                    return v_dist
+
+                bucket = buckets[i]
+                buckets[i] = []
+                last = min(v_dist[v] for v in bucket)
+                for v in bucket:            # Each goes to a strictly lower bucket
+                    buckets[(v_dist[v] ^ last).bit_length()].append(v)
+
+            v = buckets[0].pop()
+            if settled[v]:                  # Duplicate entry of a vertex pushed twice
+                stale += 1
+                continue
+            settled[v] = 1
+
+            for u, weight in edges_of(v):
+                if last + weight < v_dist.get(u, INF):
+                    v_dist[u] = last + weight
+                    i = (v_dist[u] ^ last).bit_length()
+                    while len(buckets) <= i:
+                        buckets.append([])
+                    buckets[i].append(u)
+
+    def _max_weight(self):
+        """
+        Returns the largest edge weight in the graph, 0 if there are no edges,
+        or None if a weight isn't an integer. The result is kept until the
+        graph changes, so repeated dijkstra calls don't scan every edge.
+        """
+        if self._max_weight_cache is None or self._max_weight_cache[0] != self._version:
+            self._max_weight_cache = (self._version, self._scan_max_weight())
+        return self._max_weight_cache[1]
+
+    def _scan_max_weight(self):
+        """
+        Helper method for _max_weight: goes through every edge.
+        """
+        out_edges = type(self)._out_edges     # Not instrumented: nothing is expanded
+        max_weight = 0
+        for v in range(self.v_count):
+            for _, weight in out_edges(self, v):
+                if not isinstance(weight, int):
+                    return None
+                if weight > max_weight:
+                    max_weight = weight
+        return max_weight
+
+    def dijkstra_many(self, sources, workers=None, method='heap'):
+        """
+        Runs dijkstra from every vertex in sources, spread over a pool of
+        worker processes (os.cpu_count() of them if workers is None).
+        Yields (source, distances) tuples in the order of sources, as soon
+        as each one is ready.
+        The graph is sent to each worker once, as CSR arrays, when the
+        worker starts; after that each task only carries a source vertex.
+        With workers=1 everything runs in this process.
+        """
+        sources = list(sources)
+        if workers is None:
+            workers = os.cpu_count() or 1
+        workers = min(workers, len(sources))
+
+        if workers <= 1:
+            for src in sources:
+                yield src, self.dijkstra(src, method)
+            return
+
+        chunk_size = max(1, len(sources) // (workers * 4))
+        csr = [array('q', a) if isinstance(a, memoryview) else a for a in self.to_csr()]    # Mapped files can't be pickled
+        with multiprocessing.Pool(workers, _init_worker, (self.v_count, *csr)) as pool:
+            tasks = [(src, method) for src in sources]
+            for src, distances in pool.imap(_worker_dijkstra, tasks, chunk_size):
+                yield src, distances
+
+    def all_pairs_shortest_paths(self, workers=None, method='heap') -> []:
+        """
+        Returns the distance matrix of the graph: row i is dijkstra(i).
+        Rows are computed in parallel with dijkstra_many.
+        """
+        return [distances for _, distances in
+                self.dijkstra_many(range(self.v_count), workers, method)]
+
+    def to_csr(self) -> ():
+        """
+        Returns the edges packed as CSR arrays (offsets, targets, weights):
+        the successors of v are targets[offsets[v]:offsets[v + 1]] in
+        ascending order, and weights holds the matching edge weights.
+        """
+        offsets = array('q', [0]) * (self.v_count + 1)
+        targets = array('q')
+        weights = array('q')
 
+        for v in range(self.v_count):
+            for u, weight in self._out_edges(v):
+                targets.append(u)
+                weights.append(weight)
+            offsets[v + 1] = len(targets)
 
+        return offsets, targets, weights
 
+    def save(self, path) -> None:
+        """
+        Writes the graph to path in the binary CSR format of graph_io.
+        """
+        graph_io.write_graph(path, graph_io.DIRECTED, self.v_count, *self.to_csr())
 
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Reads a graph written by save() into a graph of this class.
+        SparseDirectedGraph.load keeps the file's arrays as its frozen CSR
+        form, so with mmap=True queries run straight off the memory mapped
+        file and processes loading the same file share its pages. The other
+        classes copy the edges into their own storage.
+        """
+        contents = graph_io.read_graph(path, mmap)
+        if contents.kind != graph_io.DIRECTED:
+            raise ValueError(f"{path} does not hold a directed graph")
+        return cls._from_csr(contents.v_count, contents.offsets, contents.targets, contents.weights)
 
+    @classmethod
+    def _from_csr(cls, v_count: int, offsets, targets, weights):
+        """
+        Builds a graph of this class from CSR arrays, as returned by to_csr().
+        """
+        graph = cls._with_vertices(v_count)
+        for v in range(v_count):
+            for i in range(offsets[v], offsets[v + 1]):
+                graph._set_weight(v, targets[i], weights[i])
+        return graph
+
+    @graph_cache.cached
+    def shortest_path(self, src: int, dst: int, bidirectional=False) -> PathResult:
+        """
+        Point to point version of dijkstra.
+        Returns a PathResult of the distance from src to dst, the list of
+        vertices on a shortest path (src first, dst last), and the number of
+        vertices settled by the search.
+        The search stops as soon as dst is settled.
+        With bidirectional=True, it searches forward from src and backward
+        from dst at the same time, which usually settles far fewer vertices.
+        If either vertex does not exist or dst can't be reached,
+        the distance is infinity and the path is empty.
+        """
+        if not self._has_vertex(src) or not self._has_vertex(dst):
+            return PathResult(INF, [], 0)
+        if bidirectional:
+            return self._bidirectional_path(src, dst)
+
+        heappush, heappop = self._heappush, self._heappop
+        v_dist = {src: 0}
+        predecessor = {src: None}   # Key = vertex : Value = vertex it was reached from
+        settled = 0
+        stale = 0
+        pq = [(0, src)]
+        result = PathResult(INF, [], 0)
+
+        while len(pq) != 0:
+            d, v = heappop(pq)
+            if d > v_dist[v]:
+                stale += 1
+                continue
+            settled += 1
+            if v == dst:
+                result = PathResult(d, _walk_back(predecessor, dst)[::-1], settled)
+                break
+
+            for u, weight in self._out_edges(v):
+                if d + weight < v_dist.get(u, INF):
+                    v_dist[u] = d + weight
+                    predecessor[u] = v
+                    heappush(pq, (d + weight, u))
+        else:
+            result = PathResult(INF, [], settled)
+
+        if self._stats is not None:
+            self._stats.count('stale_entries', stale)
+        return result
+
+    def _bidirectional_path(self, src: int, dst: int) -> PathResult:
+        """
+        Helper method for shortest_path.
+        Runs one dijkstra forward from src over out edges and one backward
+        from dst over in edges (read from the predecessor index, so each
+        expansion is O(in-degree)), always advancing the side with the smaller
+        queue head. Every edge that links the two searches gives a candidate
+        path; the best one is final once the two queue heads add up to it.
+        """
+        dist = ({src: 0}, {dst: 0})                 # Forward, backward
+        predecessor = ({src: None}, {dst: None})
+        pqs = ([(0, src)], [(0, dst)])
+        edges_of = (self._out_edges, self._indexed_in_edges)
+        best, meet = (0, src) if src == dst else (INF, None)
+        heappush, heappop = self._heappush, self._heappop
+        settled = 0
+        stale = 0
+
+        while len(pqs[0]) != 0 and len(pqs[1]) != 0:
+            if pqs[0][0][0] + pqs[1][0][0] >= best:   # Nothing left can beat the best candidate
+                break
+
+            side = 0 if pqs[0][0][0] <= pqs[1][0][0] else 1
+            d, v = heappop(pqs[side])
+            if d > dist[side][v]:
+                stale += 1
+                continue
+            settled += 1
+
+            this_dist, other_dist = dist[side], dist[1 - side]
+            for u, weight in edges_of[side](v):
+                if d + weight < this_dist.get(u, INF):
+                    this_dist[u] = d + weight
+                    predecessor[side][u] = v
+                    heappush(pqs[side], (d + weight, u))
+                if u in other_dist and d + weight + other_dist[u] < best:
+                    best = d + weight + other_dist[u]
+                    meet = u
+
+        if self._stats is not None:
+            self._stats.count('stale_entries', stale)
+        if meet is None:
+            return PathResult(INF, [], settled)
+
+        # src .. meet comes from the forward tree, meet .. dst from the backward one
+        path = _walk_back(predecessor[0], meet)[::-1] + _walk_back(predecessor[1], meet)[1:]
+        return PathResult(best, path, settled)
+
+    def astar(self, src: int, dst: int, heuristic=None) -> PathResult:
+        """
+        A* search from src to dst. heuristic(v) estimates the distance from
+        v to dst and must never overestimate it; vertices it gives infinity
+        for are taken to be unable to reach dst and are never queued.
+        With heuristic=None it settles vertices in the same order as
+        shortest_path. Use alt_heuristic(dst) for landmark bounds.
+        Returns a PathResult like shortest_path, so the settled counts of
+        the two can be compared.
+        """
+        if not self._has_vertex(src) or not self._has_vertex(dst):
+            return PathResult(INF, [], 0)
+        if heuristic is None:
+            heuristic = _zero
+
+        heappush, heappop = self._heappush, self._heappop
+        v_dist = {src: 0}
+        predecessor = {src: None}
+        settled = 0
+        stale = 0
+        pq = [(heuristic(src), 0, src)]    # (distance + estimate, distance, vertex)
+        result = PathResult(INF, [], 0)
+
+        while len(pq) != 0:
+            _, d, v = heappop(pq)
+            if d > v_dist[v]:
+                stale += 1
+                continue
+            settled += 1
+            if v == dst:
+                result = PathResult(d, _walk_back(predecessor, dst)[::-1], settled)
+                break
+
+            for u, weight in self._out_edges(v):
+                if d + weight < v_dist.get(u, INF):
+                    estimate = heuristic(u)
+                    if estimate == INF:     # u can't reach dst
+                        continue
+                    v_dist[u] = d + weight
+                    predecessor[u] = v
+                    heappush(pq, (d + weight + estimate, d + weight, u))
+        else:
+            result = PathResult(INF, [], settled)
+
+        if self._stats is not None:
+            self._stats.count('stale_entries', stale)
+        return result
+
+    def prepare_landmarks(self, k=8, seed=None) -> []:
+        """
+        ALT preprocessing for astar. Picks k landmarks (the first at random,
+        then each time the vertex farthest from the landmarks picked so
+        far) and stores dijkstra distances from and to each of them.
+        Returns the landmarks. Changing the graph makes the tables out of
+        date; alt_heuristic then asks for this to be run again.
+        """
+        k = min(k, self.v_count)
+        if k == 0:
+            self._landmarks = (self._version, [], [], [])
+            return []
+
+        landmarks = [random.Random(seed).randrange(self.v_count)]
+        from_landmark, to_landmark = [], []
+        nearest = [INF] * self.v_count     # Distance from the closest landmark
+        while True:
+            landmark = landmarks[-1]
+            from_landmark.append(self.dijkstra(landmark))
+            to_landmark.append(self.dijkstra(landmark, reverse=True))
+            if len(landmarks) == k:
+                break
+
+            nearest = [min(a, b) for a, b in zip(nearest, from_landmark[-1])]
+            for v in landmarks:
+                nearest[v] = -1
+            # Unreached vertices (infinity) come first, covering other parts of the graph
+            landmarks.append(max(range(self.v_count), key=nearest.__getitem__))
+
+        self._landmarks = (self._version, landmarks, from_landmark, to_landmark)
+        return list(landmarks)
+
+    def alt_heuristic(self, dst: int):
+        """
+        Returns heuristic(v) for astar(src, dst, heuristic): the best lower
+        bound on the distance from v to dst that the triangle inequality
+        gives through the landmarks of prepare_landmarks, which is
+        infinity where it proves dst can't be reached.
+        """
+        if self._landmarks is None or self._landmarks[0] != self._version:
+            raise ValueError("no landmarks for the current graph, call prepare_landmarks()")
+        _, _, from_landmark, to_landmark = self._landmarks
+        # Per landmark L: (distances from L, distance L -> dst, distances to L, distance dst -> L)
+        tables = [(f, f[dst], t, t[dst]) for f, t in zip(from_landmark, to_landmark)]
+
+        def heuristic(v) -> int:
+            best = 0
+            for from_l, l_to_dst, to_l, dst_to_l in tables:
+                if from_l[v] != INF:        # d(L, dst) <= d(L, v) + d(v, dst)
+                    if l_to_dst == INF:
+                        return INF
+                    best = max(best, l_to_dst - from_l[v])
+                if dst_to_l != INF:         # d(v, L) <= d(v, dst) + d(dst, L)
+                    if to_l[v] == INF:
+                        return INF
+                    best = max(best, to_l[v] - dst_to_l)
+            return best
+
+        return heuristic
+
+    # ------------------------------------------------------------------ #
+    # Storage primitives. Every method above reaches the edges through
+    # these, so a subclass only has to override this block to change
+    # how the graph is stored. Lists they return belong to the graph and
+    # must not be modified by the caller.
+
+    @classmethod
+    def _with_vertices(cls, v_count: int):
+        """
+        Returns a new graph of this class with v_count vertices and no edges,
+        with its storage allocated in one go.
+        """
+        graph = cls()
+        graph.adj_matrix = [[0] * v_count for _ in range(v_count)]
+        graph.v_count = v_count
+        return graph
+
+    def _has_vertex(self, v) -> bool:
+        """
+        Returns True if v names a vertex of the graph. Any integer type
+        counts (NumPy integers too), as long as it is in range.
+        """
+        try:
+            v = operator.index(v)
+        except TypeError:
+            return False
+        return 0 <= v < self.v_count
+
+    def _writable(self) -> None:
+        """
+        Called before the graph is changed: snapshots can't be.
+        """
+        if self._read_only:
+            raise TypeError("graph snapshots are read-only")
+
+    def _share(self):
+        """
+        Returns a new graph of this class over the same rows, for snapshot().
+        From then on _set_weight copies a row before changing it.
+        """
+        graph = type(self)()
+        graph.v_count = self.v_count
+        graph.adj_matrix = list(self.adj_matrix)
+        if self._row_cache is not None:     # Cached rows are never changed in place either
+            graph._row_cache = list(self._row_cache)
+        self._owned_rows = set()
+        return graph
+
+    def _grow_to(self, v_count: int) -> None:
+        """
+        Adds vertices until there are v_count of them.
+        """
+        if self._pending:                   # Edges queued by batch() come first
+            ops, self._pending = self._pending, []
+            self.apply_batch(ops)
+        if v_count > self.v_count:
+            self._writable()
+            self._add_vertices(v_count - self.v_count)
+            if self._in_index is not None:
+                self._in_index.extend({} for _ in range(v_count - self.v_count))
+                self._in_rows.extend([None] * (v_count - self.v_count))
+            self.v_count = v_count
+            self._version += 1
+
+    def _add_vertices(self, count: int) -> None:
+        """
+        Grows the adjacency matrix by count rows and count columns.
+        """
+        vertices = len(self.adj_matrix)
+
+        if self._owned_rows is not None:    # Rows are shared with a snapshot, so widen copies
+            self.adj_matrix = [u + [0] * count for u in self.adj_matrix]
+            self._owned_rows = None
+        else:
+            for u in self.adj_matrix:
+                u.extend([0] * count)       # Add cells to all other vertices for the new vertices
+
+        for _ in range(count):              # Add the new vertices to the list
+            self.adj_matrix.append([0] * (vertices + count))
+
+        if self._row_cache is not None:     # New columns are empty, so cached rows stay valid
+            self._row_cache.extend([None] * count)
+
+    def _set_weight(self, src: int, dst: int, weight: int) -> None:
+        """
+        Stores the weight of the edge src -> dst. A weight of 0 removes the edge.
+        Both vertices are assumed to be valid.
+        """
+        if self._owned_rows is not None and src not in self._owned_rows:
+            self.adj_matrix[src] = list(self.adj_matrix[src])   # Row is shared with a snapshot
+            self._owned_rows.add(src)
+        self.adj_matrix[src][dst] = weight
+        if self._row_cache is not None:
+            self._row_cache[src] = None     # Only the row of src changed
+
+    def _set_weights(self, changes) -> None:
+        """
+        Stores a batch of (src, dst, weight) changes, as _set_weight would
+        one at a time.
+        """
+        for src, dst, weight in changes:
+            self._set_weight(src, dst, weight)
+
+    def _weight(self, src: int, dst: int) -> int:
+        """
+        Returns the weight of the edge src -> dst, or 0 if there is no edge.
+        """
+        return self.adj_matrix[src][dst]
+
+    def _successors(self, v: int) -> []:
+        """
+        Returns the direct successors of v in ascending order.
+        """
+        return self._row(v)[0]
+
+    def _successors_desc(self, v: int) -> []:
+        """
+        Returns the direct successors of v in descending order.
+        """
+        return self._row(v)[1]
+
+    def _out_edges(self, v: int) -> []:
+        """
+        Returns the out edges of v as (destination, weight) tuples,
+        in ascending order of destination.
+        """
+        return self._row(v)[2]
+
+    def _out_degree(self, v: int) -> int:
+        """
+        Returns the number of edges out of v.
+        """
+        return len(self._row(v)[0])
+
+    def _row(self, v: int) -> ():
+        """
+        Returns the cached (ascending successors, descending successors,
+        out edges) of v, scanning its matrix row if they aren't cached.
+        _set_weight drops the entry of the row it changes.
+        """
+        if self._row_cache is None:
+            self._row_cache = [None] * self.v_count
+        row = self._row_cache[v]
+        if row is None:
+            # Edges are represented as weight values, but we care about the destination vertex.
+            # So we convert the row to be one of the connected destinations rather than weights.
+            edges = [(x, weight) for x, weight in enumerate(self.adj_matrix[v]) if weight != 0]
+            successors = [x for x, _ in edges]
+            row = self._row_cache[v] = (successors, successors[::-1], edges)
+        return row
+
+    def _in_edges(self, v: int) -> []:
+        """
+        Returns the in edges of v as (source, weight) tuples,
+        in ascending order of source. This scans the column of v.
+        """
+        return [(x, row[v]) for x, row in enumerate(self.adj_matrix) if row[v] != 0]
+
+    # The predecessor index sits on top of the storage primitives, so every
+    # subclass gets it without overriding anything.
+
+    def _predecessor_index(self) -> []:
+        """
+        Returns the predecessor index, building it from the out edges
+        if it doesn't exist yet.
+        """
+        if self._in_index is None:
+            out_edges = type(self)._out_edges     # Not instrumented: nothing is expanded
+            index = [{} for _ in range(self.v_count)]
+            for v in range(self.v_count):
+                for u, weight in out_edges(self, v):
+                    index[u][v] = weight
+            self._in_index = index
+            self._in_rows = [None] * self.v_count
+        return self._in_index
+
+    def _in_row(self, v: int) -> ():
+        """
+        Returns the cached (ascending predecessors, descending predecessors,
+        in edges) of v, sorting its predecessor index row if they aren't
+        cached. The mutating methods drop the entry of the row they change.
+        """
+        index = self._predecessor_index()
+        row = self._in_rows[v]
+        if row is None:
+            edges = sorted(index[v].items())
+            predecessors = [u for u, _ in edges]
+            row = self._in_rows[v] = (predecessors, predecessors[::-1], edges)
+        return row
+
+    def _predecessors(self, v: int) -> []:
+        """
+        Returns the direct predecessors of v in ascending order.
+        """
+        return self._in_row(v)[0]
+
+    def _predecessors_desc(self, v: int) -> []:
+        """
+        Returns the direct predecessors of v in descending order.
+        """
+        return self._in_row(v)[1]
+
+    def _indexed_in_edges(self, v: int) -> []:
+        """
+        Returns the in edges of v as (source, weight) tuples, in ascending
+        order of source, read from the predecessor index.
+        """
+        return self._in_row(v)[2]
+
+
+def _as_sequence(values, keep_arrays=False):
+    """
+    Helper for from_arrays. Returns values as a sequence that can be gone
+    over more than once: iterators are read into a list, and NumPy arrays
+    are turned into lists of Python numbers unless keep_arrays is True.
+    """
+    if not hasattr(values, '__len__'):
+        return list(values)
+    if not keep_arrays and np is not None and isinstance(values, np.ndarray):
+        return values.tolist()
+    return values
+
+
+def _integer_weight(weight):
+    """
+    Returns weight as an int, or None if it isn't an integer. Weights must
+    be positive integers (see add_edge); NumPy integers become ints.
+    """
+    try:
+        return operator.index(weight)
+    except TypeError:
+        return None
+
+
+def _parse_edge_op(op) -> ():
+    """
+    Helper for apply_batch. Returns (command, src, dst, weight) for an op
+    given as a tuple or a string; weight is None for 'remove'.
+    """
+    if isinstance(op, str):
+        command, *fields = op.split()
+        op = (command, *map(int, fields))
+
+    if op[0] == 'add':
+        if len(op) == 4:
+            return 'add', operator.index(op[1]), operator.index(op[2]), op[3]
+        if len(op) == 3:
+            return 'add', operator.index(op[1]), operator.index(op[2]), 1
+    elif op[0] == 'remove' and len(op) == 3:
+        return 'remove', operator.index(op[1]), operator.index(op[2]), None
+    raise ValueError(f"expected ('add', src, dst[, weight]) or ('remove', src, dst), got {op!r}")
+
+
+def _transpose_csr(v_count: int, offsets, targets, weights) -> ():
+    """
+    Returns the (offsets, sources, weights) CSR arrays of the reversed graph.
+    Sources come out in ascending order because the input rows are walked in order.
+    """
+    in_offsets = array('q', [0]) * (v_count + 1)
+    for u in targets:                       # Count the in degree of every vertex
+        in_offsets[u + 1] += 1
+    for v in range(v_count):                # Running sum gives the row starts
+        in_offsets[v + 1] += in_offsets[v]
+
+    fill = array('q', in_offsets)
+    sources = array('q', [0]) * len(targets)
+    in_weights = array('q', [0]) * len(targets)
+    for v in range(v_count):
+        for i in range(offsets[v], offsets[v + 1]):
+            u = targets[i]
+            sources[fill[u]] = v
+            in_weights[fill[u]] = weights[i]
+            fill[u] += 1
+
+    return in_offsets, sources, in_weights
+
+
+def _gather_rows(offsets, values, rows):
+    """
+    Helper for bfs_levels(numpy=True). Returns a NumPy array of every entry
+    values[offsets[r]:offsets[r + 1]], for each r in rows.
+    """
+    starts = offsets[rows]
+    counts = offsets[rows + 1] - starts
+    # Position of each entry inside its row, added to the row's start
+    within = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return values[np.repeat(starts, counts) + within]
+
+
+# Graph held by each dijkstra_many worker process, set once by _init_worker.
+_worker_graph = None
+
+
+def _init_worker(v_count: int, offsets, targets, weights) -> None:
+    """
+    Pool initializer for dijkstra_many: rebuilds the graph from its CSR
+    arrays once per worker process.
+    """
+    global _worker_graph
+    _worker_graph = SparseDirectedGraph._from_csr(v_count, offsets, targets, weights)
+
+
+def _worker_dijkstra(task: ()) -> ():
+    """
+    Pool task for dijkstra_many: runs one dijkstra on the worker's graph.
+    """
+    src, method = task
+    return src, _worker_graph.dijkstra(src, method)
+
+
+class SparseDirectedGraph(DirectedGraph):
+    """
+    Directed weighted graph stored as an adjacency list rather than a matrix.
+    - each vertex keeps a dict of successor -> weight, so memory is O(V + E)
+    - freeze() packs the dicts into CSR arrays (offsets, targets, weights)
+      so traversals read presorted successor slices without any sorting
+    - any mutation drops the frozen form, it is rebuilt by the next freeze()
+    - load(path) adopts the file's arrays as the frozen form without copying
+    Same rules and the same public methods as DirectedGraph.
+    """
+
+    def __init__(self, start_edges=None):
+        """
+        Store graph info as a list of successor dicts, one per vertex
+        """
+        self.v_count = 0
+        self.adj_succ = []
+        self._csr = None
+        self._reverse_csr = None
+
+        if start_edges is not None:
+            v_count = 0
+            for u, v, _ in start_edges:
+                v_count = max(v_count, u, v)
+            self.v_count = v_count + 1          # Allocate every vertex at once
+            self.adj_succ = [{} for _ in range(self.v_count)]
+            for u, v, weight in start_edges:
+                self.add_edge(u, v, weight)
+
+    @property
+    def adj_matrix(self) -> []:
+        """
+        Dense copy of the graph, as DirectedGraph stores it.
+        Only meant for printing small graphs: this is O(V^2).
+        """
+        matrix = [[0] * self.v_count for _ in range(self.v_count)]
+        for v in range(self.v_count):
+            for u, weight in self._out_edges(v):
+                matrix[v][u] = weight
+        return matrix
+
+    def freeze(self):
+        """
+        Packs the adjacency into CSR form: the successors of v are
+        targets[offsets[v]:offsets[v + 1]] in ascending order, with matching
+        weights. Traversals use the CSR arrays until the graph is mutated.
+        Returns the graph so it can be chained.
+        """
+        if self._csr is None:
+            self._csr = super().to_csr()
+            self._reverse_csr = None
+        return self
+
+    def to_csr(self) -> ():
+        return self.freeze()._csr
+
+    @classmethod
+    def _from_csr(cls, v_count: int, offsets, targets, weights):
+        """
+        Adopts the CSR arrays as the frozen form without copying them.
+        The successor dicts are only built if the graph is later mutated.
+        """
+        graph = cls()
+        graph.v_count = v_count
+        graph.adj_succ = None
+        graph._csr = (offsets, targets, weights)
+        return graph
+
+    @classmethod
+    def from_arrays(cls, src, dst, weight=None):
+        """
+        Same as DirectedGraph.from_arrays, writing straight into the
+        successor dicts.
+        """
+        src, dst = _as_sequence(src), _as_sequence(dst)
+        weight = repeat(1) if weight is None else _as_sequence(weight)
+
+        v_count = max(0, max(src, default=0), max(dst, default=0)) + 1
+        graph = cls._with_vertices(v_count)
+        adj_succ = graph.adj_succ
+        for u, v, w in zip(src, dst, weight):
+            if type(w) is not int:
+                w = _integer_weight(w)
+                if w is None:
+                    continue
+            if w >= 1 and u != v and u >= 0 and v >= 0:     # Same checks as add_edge
+                adj_succ[u][operator.index(v)] = w          # v is a key, so no NumPy scalars
+
+        return graph
+
+    @classmethod
+    def _with_vertices(cls, v_count: int):
+        graph = cls()
+        graph.adj_succ = [{} for _ in range(v_count)]
+        graph.v_count = v_count
+        return graph
+
+    def _thaw(self) -> None:
+        """
+        Rebuilds the successor dicts of a graph that only has its CSR form.
+        """
+        offsets, targets, weights = self._csr
+        self.adj_succ = [dict(zip(targets[offsets[v]:offsets[v + 1]], weights[offsets[v]:offsets[v + 1]]))
+                         for v in range(self.v_count)]
+        self._owned_rows = None             # Every dict is new
+
+    def _share(self):
+        """
+        Returns a new graph sharing the successor dicts and the CSR arrays,
+        which are never changed in place.
+        """
+        graph = type(self)()
+        graph.v_count = self.v_count
+        graph._csr, graph._reverse_csr = self._csr, self._reverse_csr
+        if self.adj_succ is None:
+            graph.adj_succ = None
+        else:
+            graph.adj_succ = list(self.adj_succ)
+            self._owned_rows = set()
+        return graph
+
+    @property
+    def is_frozen(self) -> bool:
+        """
+        True if the CSR form is current.
+        """
+        return self._csr is not None
+
+    def _add_vertices(self, count: int) -> None:
+        if self.adj_succ is None:
+            self._thaw()
+        self.adj_succ.extend({} for _ in range(count))
+        self._csr = None
+
+    def _set_weight(self, src: int, dst: int, weight: int) -> None:
+        if self.adj_succ is None:
+            self._thaw()
+        if self._owned_rows is not None and src not in self._owned_rows:
+            self.adj_succ[src] = dict(self.adj_succ[src])       # Dict is shared with a snapshot
+            self._owned_rows.add(src)
+        if weight == 0:
+            self.adj_succ[src].pop(dst, None)
+        else:
+            self.adj_succ[src][dst] = weight
+        self._csr = None
+
+    def _set_weights(self, changes) -> None:
+        if self.adj_succ is None:
+            self._thaw()
+        adj_succ, owned = self.adj_succ, self._owned_rows
+        for src, dst, weight in changes:
+            if owned is not None and src not in owned:
+                adj_succ[src] = dict(adj_succ[src])     # Dict is shared with a snapshot
+                owned.add(src)
+            if weight == 0:
+                adj_succ[src].pop(dst, None)
+            else:
+                adj_succ[src][dst] = weight
+        self._csr = None
+
+    def _weight(self, src: int, dst: int) -> int:
+        if self.adj_succ is None:           # Binary search the sorted CSR row
+            offsets, targets, weights = self._csr
+            i = bisect_left(targets, dst, offsets[src], offsets[src + 1])
+            if i < offsets[src + 1] and targets[i] == dst:
+                return weights[i]
+            return 0
+        return self.adj_succ[src].get(dst, 0)
+
+    def _successors(self, v: int) -> []:
+        if self._csr is not None:
+            offsets, targets, _ = self._csr
+            return targets[offsets[v]:offsets[v + 1]].tolist()
+        return sorted(self.adj_succ[v])
+
+    def _successors_desc(self, v: int) -> []:
+        return self._successors(v)[::-1]
+
+    def _out_degree(self, v: int) -> int:
+        if self._csr is not None:
+            offsets = self._csr[0]
+            return offsets[v + 1] - offsets[v]
+        return len(self.adj_succ[v])
+
+    def _out_edges(self, v: int) -> []:
+        if self._csr is not None:
+            offsets, targets, weights = self._csr
+            start, end = offsets[v], offsets[v + 1]
+            return list(zip(targets[start:end], weights[start:end]))
+        successors = self.adj_succ[v]
+        return [(u, successors[u]) for u in sorted(successors)]
+
+    def _in_edges(self, v: int) -> []:
+        # Unfrozen, this has to look at every vertex. Frozen, the reverse
+        # CSR (the transpose of the frozen arrays) is built on first use.
+        if self._csr is None:
+            return [(u, successors[v]) for u, successors in enumerate(self.adj_succ) if v in successors]
+
+        if self._reverse_csr is None:
+            self._reverse_csr = _transpose_csr(self.v_count, *self._csr)
+        offsets, sources, weights = self._reverse_csr
+        start, end = offsets[v], offsets[v + 1]
+        return list(zip(sources[start:end], weights[start:end]))
+
+
+class NumpyDirectedGraph(DirectedGraph):
+    """
+    Directed weighted graph stored as a NumPy adjacency matrix.
+    Meant for graphs that really are dense: successor lookups, get_edges
+    and dijkstra work on whole rows at once instead of looping in Python.
+    - the matrix lives in a square buffer whose capacity doubles when full,
+      so add_vertex is amortised O(V) instead of touching every row
+    - adj_matrix is the v_count x v_count view of that buffer
+    - dijkstra defaults to the array based O(V^2) version (method='dense');
+      the other methods of DirectedGraph.dijkstra are still available
+    Requires numpy.
+    """
+
+    _buffer_shared = False      # True while a snapshot holds the buffer
+
+    def __init__(self, start_edges=None):
+        """
+        Store graph info as a NumPy adjacency matrix
+        """
+        if np is None:
+            raise ImportError("NumpyDirectedGraph requires numpy")
+
+        self.v_count = 0
+        self._buffer = np.zeros((0, 0), dtype=np.int64)
+
+        if start_edges is not None:
+            v_count = 0
+            for u, v, _ in start_edges:
+                v_count = max(v_count, u, v)
+            self._reserve(v_count + 1)          # Allocate every vertex at once
+            self.v_count = v_count + 1
+            for u, v, weight in start_edges:
+                self.add_edge(u, v, weight)
+
+    @property
+    def adj_matrix(self):
+        """
+        The v_count x v_count part of the buffer (a view, not a copy).
+        """
+        return self._buffer[:self.v_count, :self.v_count]
+
+    def get_edges(self) -> []:
+        matrix = self.adj_matrix
+        sources, targets = np.nonzero(matrix)   # Row major, so already in ascending order
+        weights = matrix[sources, targets]
+        return list(zip(sources.tolist(), targets.tolist(), weights.tolist()))
+
+    @graph_cache.cached
+    def dijkstra(self, src: int, method='dense', reverse=False) -> []:
+        """
+        Same as DirectedGraph.dijkstra, with one more method:
+        - 'dense': O(V^2) Dijkstra on arrays. Each step settles the closest
+          unsettled vertex (argmin over the distance array) and relaxes its
+          whole row at once. No priority queue, which suits dense graphs.
+        """
+        if method != 'dense':
+            # The unwrapped base method: this call is already cached under the same key
+            return DirectedGraph.dijkstra.__wrapped__(self, src, method, reverse)
+
+        matrix = self.adj_matrix.T if reverse else self.adj_matrix     # Columns hold the in edges
+        dist = np.full(self.v_count, np.inf)
+        settled = np.zeros(self.v_count, dtype=bool)
+        dist[src] = 0
+        expanded = 0
+
+        for _ in range(self.v_count):
+            v = int(np.argmin(np.where(settled, np.inf, dist)))
+            if settled[v] or dist[v] == np.inf:     # Everything left is unreachable
+                break
+            settled[v] = True
+            expanded += 1
+
+            row = matrix[v]
+            reach = (row != 0) & ~settled
+            np.minimum(dist, dist[v] + row, out=dist, where=reach)
+
+        if self._stats is not None:
+            self._stats.count('vertices_expanded', expanded)
+
+        # Weights are integers, so give back ints like the other methods do
+        return [INF if d == INF else int(d) for d in dist.tolist()]
+
+    def to_csr(self) -> ():
+        matrix = self.adj_matrix
+        sources, targets = np.nonzero(matrix)
+        offsets = np.zeros(self.v_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=self.v_count), out=offsets[1:])
+        return (array('q', offsets.tobytes()), array('q', targets.astype(np.int64).tobytes()),
+                array('q', matrix[sources, targets].astype(np.int64).tobytes()))
+
+    @classmethod
+    def _from_csr(cls, v_count: int, offsets, targets, weights):
+        graph = cls._with_vertices(v_count)
+        offsets = np.asarray(offsets, dtype=np.int64)
+        sources = np.repeat(np.arange(v_count), np.diff(offsets))
+        graph._buffer[sources, np.asarray(targets, dtype=np.int64)] = np.asarray(weights, dtype=np.int64)
+        return graph
+
+    @classmethod
+    def from_arrays(cls, src, dst, weight=None):
+        """
+        Same as DirectedGraph.from_arrays, with the checks and the fill
+        done on whole arrays at once.
+        """
+        src = np.asarray(_as_sequence(src, keep_arrays=True), dtype=np.int64)
+        dst = np.asarray(_as_sequence(dst, keep_arrays=True), dtype=np.int64)
+        if weight is None:
+            weight = np.ones_like(src)
+        else:
+            weight = _as_sequence(weight, keep_arrays=True)
+            values = np.asarray(weight)
+            if values.dtype.kind not in 'iub':      # Weights that aren't integers are skipped, not truncated
+                values = np.array([0 if _integer_weight(w) is None else w for w in weight], dtype=np.int64)
+            weight = values.astype(np.int64, copy=False)
+
+        v_count = max(0, int(src.max(initial=0)), int(dst.max(initial=0))) + 1
+        keep = (weight >= 1) & (src != dst) & (src >= 0) & (dst >= 0)
+        src, dst, weight = src[keep], dst[keep], weight[keep]
+
+        # An edge given twice keeps its last weight: find the first copy of
+        # each edge in the reversed arrays
+        _, last = np.unique((src * v_count + dst)[::-1], return_index=True)
+        last = len(src) - 1 - last
+
+        graph = cls._with_vertices(v_count)
+        graph._buffer[src[last], dst[last]] = weight[last]
+        return graph
+
+    @classmethod
+    def _with_vertices(cls, v_count: int):
+        graph = cls()
+        graph._reserve(v_count)
+        graph.v_count = v_count
+        return graph
+
+    def _reserve(self, capacity: int) -> None:
+        """
+        Makes sure the buffer has room for at least capacity vertices,
+        at least doubling its size when it has to grow.
+        """
+        old_capacity = self._buffer.shape[0]
+        if capacity <= old_capacity:
+            return
+
+        buffer = np.zeros((max(capacity, 2 * old_capacity),) * 2, dtype=np.int64)
+        buffer[:old_capacity, :old_capacity] = self._buffer
+        self._buffer = buffer
+        self._buffer_shared = False
+
+    def _share(self):
+        """
+        Returns a new graph over the same buffer. The buffer is one array,
+        so the first change after this copies all of it.
+        """
+        graph = type(self)()
+        graph.v_count = self.v_count
+        graph._buffer = self._buffer
+        self._buffer_shared = True
+        return graph
+
+    def _scan_max_weight(self) -> int:
+        return int(self.adj_matrix.max()) if self.v_count != 0 else 0     # The buffer only holds integers
+
+    def _add_vertices(self, count: int) -> None:
+        self._reserve(self.v_count + count)     # New rows and columns are already zero
+
+    def _set_weight(self, src: int, dst: int, weight: int) -> None:
+        if self._buffer_shared:
+            self._buffer = self._buffer.copy()
+            self._buffer_shared = False
+        self._buffer[src, dst] = weight
+
+    def _set_weights(self, changes) -> None:
+        """
+        Writes the whole batch with one fancy-indexed assignment.
+        """
+        if self._buffer_shared:
+            self._buffer = self._buffer.copy()
+            self._buffer_shared = False
+        changes = np.array(changes, dtype=np.int64).reshape(-1, 3)
+        self._buffer[changes[:, 0], changes[:, 1]] = changes[:, 2]
+
+    def _weight(self, src: int, dst: int) -> int:
+        return int(self._buffer[src, dst])
+
+    def _successors(self, v: int) -> []:
+        return np.flatnonzero(self._buffer[v, :self.v_count]).tolist()
+
+    def _successors_desc(self, v: int) -> []:
+        return np.flatnonzero(self._buffer[v, :self.v_count])[::-1].tolist()
+
+    def _out_degree(self, v: int) -> int:
+        return int(np.count_nonzero(self._buffer[v, :self.v_count]))
+
+    def _out_edges(self, v: int) -> []:
+        row = self._buffer[v, :self.v_count]
+        successors = np.flatnonzero(row)
+        return list(zip(successors.tolist(), row[successors].tolist()))
+
+    def _in_edges(self, v: int) -> []:
+        column = self._buffer[:self.v_count, v]
+        predecessors = np.flatnonzero(column)
+        return list(zip(predecessors.tolist(), column[predecessors].tolist()))
 
 
 if __name__ == '__main__':
@@ -458,3 +2195,62 @@ if __name__ == '__main__':
     print('\n', g)
     for i in range(5):
         print(f'DIJKSTRA {i} {g.dijkstra(i)}')
+
+
+    print("\nCUSTOM - shortest_path() and prepare_landmarks()")
+    print("------------------------------------------------")
+    edges = [(0, 1, 10), (4, 0, 12), (1, 4, 15), (4, 3, 3),
+             (3, 1, 5), (2, 1, 23), (3, 2, 7)]
+    g = DirectedGraph(edges)
+    for src, dst in [(0, 2), (2, 0), (3, 0), (1, 1), (0, 9)]:
+        print(f'{src}->{dst} {g.shortest_path(src, dst)}',
+              g.shortest_path(src, dst, bidirectional=True).distance)
+    g.prepare_landmarks(k=2, seed=1)
+    print('ALT', g.shortest_path(2, 0))
+
+
+    print("\nCUSTOM - apply_batch() and batch()")
+    print("----------------------------------")
+    g = DirectedGraph(edges)
+    print(g.apply_batch(['add 0 2 4', ('remove', 4, 3), 'add 2 3', ('add', 0, 2, 6), 'remove 0 9']))
+    print(g.get_edges())
+    with g.batch():
+        g.add_edge(1, 3, 2)
+        g.remove_edge(1, 4)
+        print(g.get_edges())        # Not applied yet
+    print(g.get_edges())
+
+
+    print("\nCUSTOM - snapshot()")
+    print("-------------------")
+    g = SparseDirectedGraph(edges)
+    snap = g.snapshot()
+    g.remove_edge(0, 1)
+    g.add_vertex()
+    print(g.get_edges(), g.v_count)
+    print(snap.get_edges(), snap.v_count, snap.dijkstra(0))
+    try:
+        snap.add_edge(0, 2, 1)
+    except TypeError as error:
+        print('TypeError:', error)
+
+
+    print("\nCUSTOM - save() and load()")
+    print("--------------------------")
+    import tempfile
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'graph.bin')
+        DirectedGraph(edges).save(path)
+        for graph_class in (DirectedGraph, SparseDirectedGraph):
+            g = graph_class.load(path)
+            print(graph_class.__name__, g.get_edges() == DirectedGraph(edges).get_edges(), g.dijkstra(0))
+
+
+    print("\nCUSTOM - predecessors(), topological_sort() and strongly_connected_components()")
+    print("-------------------------------------------------------------------------------")
+    g = DirectedGraph.from_edges(edges)
+    print([g.predecessors(v) for v in range(5)], g.topological_sort())
+    print(g.strongly_connected_components())
+    for src, dst in [(3, 1), (2, 1), (4, 0)]:
+        g.remove_edge(src, dst)
+    print(g.topological_sort(), g.strongly_connected_components())
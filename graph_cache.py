@@ -0,0 +1,120 @@
+# Description: Opt-in LRU cache of query results for DirectedGraph and UndirectedGraph.
+#
+# Query methods are wrapped with cached(). While a graph has no cache the
+# wrapper just calls the method. Once graph.enable_cache() is called,
+# results are stored under (method name, arguments) together with the
+# graph's version, a counter every mutating method increments, so an entry
+# is only ever served for the exact graph it was computed on.
+
+import inspect
+import sys
+from collections import OrderedDict
+from functools import wraps
+
+
+class QueryCache:
+    """
+    Least recently used cache of query results.
+    - holds at most max_entries results, and at most max_bytes bytes of
+      them if max_bytes is not None (sizes are estimated with sys.getsizeof
+      on the result and the items directly inside it)
+    - an entry computed at another graph version counts as a miss and is
+      dropped when it is looked up
+    - hits and misses count the lookups
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()    # Key : (version, result, size), oldest first
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, version: int, compute):
+        """
+        Returns the result stored under key for this version of the graph,
+        or calls compute() and stores what it returns.
+        """
+        entry = self.entries.get(key)
+        if entry is not None:
+            if entry[0] == version:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return entry[1]
+            self._drop(key)             # Computed before the graph changed
+
+        self.misses += 1
+        result = compute()
+        self._store(key, version, result)
+        return result
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.bytes = 0
+
+    def info(self) -> dict:
+        """
+        Returns the counters and the current size of the cache.
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self.entries),
+                'bytes': self.bytes, 'max_entries': self.max_entries, 'max_bytes': self.max_bytes}
+
+    def _store(self, key, version: int, result) -> None:
+        if key in self.entries:         # Replaced: its size mustn't be counted twice
+            self._drop(key)
+        size = _size_of(result)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return                      # Would evict everything and still not fit
+
+        self.entries[key] = (version, result, size)
+        self.bytes += size
+        while len(self.entries) > self.max_entries or \
+                (self.max_bytes is not None and self.bytes > self.max_bytes):
+            self._drop(next(iter(self.entries)))    # Least recently used
+
+    def _drop(self, key) -> None:
+        _, _, size = self.entries.pop(key)
+        self.bytes -= size
+
+
+def cached(method):
+    """
+    Decorator for the query methods of the graph classes: serves results
+    from the graph's QueryCache when it has one. Arguments are bound to the
+    method's signature with defaults filled in, so dfs(0), dfs(v_start=0)
+    and dfs(0, None) share one entry. Calls whose arguments can't be
+    hashed, or don't fit the signature, always run the method.
+    """
+    name = method.__name__
+    signature = inspect.signature(method)
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        cache = self._query_cache
+        if cache is None:
+            return method(self, *args, **kwargs)
+
+        try:
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            key = (name, bound.args[1:], tuple(sorted(bound.kwargs.items())))
+            hash(key)
+        except TypeError:
+            return method(self, *args, **kwargs)
+        return cache.get(key, self._version, lambda: method(self, *args, **kwargs))
+
+    return wrapper
+
+
+def _size_of(value) -> int:
+    """
+    Rough size of a result in bytes: the object plus the items directly
+    inside it.
+    """
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(sys.getsizeof(item) for item in value)
+    return size
@@ -0,0 +1,199 @@
+# Description: Binary graph file format shared by DirectedGraph and UndirectedGraph.
+#
+# A graph file is a fixed header followed by int64 arrays in CSR form:
+#
+#   header      magic, version, kind, v_count, e_count, names_size
+#   offsets     v_count + 1 values, the edges of vertex v are [offsets[v], offsets[v + 1])
+#   targets     e_count values, the other end of each edge
+#   weights     e_count values (directed graphs only)
+#   name_offs   v_count + 1 values (undirected graphs only), byte range of each name
+#   name_order  v_count values (undirected graphs only), vertex ids sorted by name
+#   names       names_size bytes of UTF-8 (undirected graphs only)
+#
+# Everything is little-endian and every array starts on an 8 byte boundary,
+# so a memory mapped file can be read in place through memoryview.cast('q').
+
+import mmap as _mmap
+import os
+import struct
+import sys
+from array import array
+from collections import namedtuple
+from itertools import islice
+
+MAGIC = b'GRAPHCSR'
+VERSION = 1
+DIRECTED, UNDIRECTED = 0, 1
+
+_HEADER = struct.Struct('<8sIIQQQ')
+
+# Contents of a graph file. weights is None for undirected graphs, names is
+# None for directed ones.
+GraphFile = namedtuple('GraphFile', ['kind', 'v_count', 'offsets', 'targets', 'weights', 'names'])
+
+
+class NameTable:
+    """
+    Read-only sequence of vertex names stored as one UTF-8 blob plus
+    offsets. Names are decoded one at a time when asked for, so a mapped
+    table costs nothing to load. order lists the ids sorted by name, which
+    lets index() binary search the table without decoding it.
+    """
+
+    def __init__(self, offsets, order, blob):
+        self.offsets = offsets
+        self.order = order
+        self.blob = blob
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self._raw(i).decode('utf-8')
+
+    def index(self, name) -> int:
+        """
+        Returns the id of name, or -1 if it is not in the table.
+        UTF-8 bytes sort in the same order as the strings they encode,
+        so the search compares raw bytes.
+        """
+        if not isinstance(name, str):
+            return -1
+        key = name.encode('utf-8')
+        low, high = 0, len(self.order)
+        while low < high:
+            middle = (low + high) // 2
+            if self._raw(self.order[middle]) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self.order) and self._raw(self.order[low]) == key:
+            return self.order[low]
+        return -1
+
+    def _raw(self, i) -> bytes:
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]])
+
+
+def write_graph(path, kind: int, v_count: int, offsets, targets, weights=None, names=None) -> None:
+    """
+    Writes a graph file. offsets, targets and weights are sequences of ints
+    (array('q') is written without conversion), names a sequence of strings.
+    """
+    encoded = [name.encode('utf-8') for name in names] if names is not None else []
+    name_offsets = array('q', [0])
+    for name in encoded:
+        name_offsets.append(name_offsets[-1] + len(name))
+    name_order = sorted(range(len(encoded)), key=encoded.__getitem__)
+
+    with open(path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, kind, v_count, len(targets), name_offsets[-1]))
+        _write_int64(f, offsets)
+        _write_int64(f, targets)
+        if kind == DIRECTED:
+            _write_int64(f, weights)
+        else:
+            _write_int64(f, name_offsets)
+            _write_int64(f, name_order)
+            for name in encoded:
+                f.write(name)
+
+
+def read_graph(path, mmap=True) -> GraphFile:
+    """
+    Reads a graph file. With mmap=True the arrays are memoryviews straight
+    over a read-only memory map of the file: nothing is copied, and every
+    process mapping the same file shares the same pages. With mmap=False
+    the file is read into array('q') objects.
+    """
+    with open(path, 'rb') as f:
+        if mmap:
+            buffer = memoryview(_mmap.mmap(f.fileno(), 0, access=_mmap.ACCESS_READ))
+        else:
+            buffer = memoryview(f.read())
+
+    magic, version, kind, v_count, e_count, names_size = _HEADER.unpack_from(buffer)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a version {VERSION} graph file")
+
+    position = _HEADER.size
+    sections = []
+    if kind == DIRECTED:
+        lengths = [v_count + 1, e_count, e_count]
+    else:
+        lengths = [v_count + 1, e_count, v_count + 1, v_count]
+    for length in lengths:
+        sections.append(_int64_view(buffer[position:position + 8 * length], copy=not mmap))
+        position += 8 * length
+
+    if kind == DIRECTED:
+        offsets, targets, weights = sections
+        return GraphFile(kind, v_count, offsets, targets, weights, None)
+
+    offsets, targets, name_offsets, name_order = sections
+    blob = buffer[position:position + names_size]
+    return GraphFile(kind, v_count, offsets, targets, None, NameTable(name_offsets, name_order, blob))
+
+
+def read_edge_chunks(source, chunk_size=65536, delimiter=None, comment='#'):
+    """
+    Reads an edge list in chunks of at most chunk_size edges, so only one
+    chunk is ever held in memory. Yields each chunk as a list of rows, a
+    row being the list of fields of one edge.
+    source can be a path, an open text file, or any iterable of lines or of
+    already split rows (tuples are passed through as they are).
+    Lines are split on delimiter (any whitespace if None, so TSV works);
+    blank lines and lines starting with comment are skipped.
+    """
+    if isinstance(source, (str, bytes, os.PathLike)):
+        with open(source, 'r', encoding='utf-8') as f:
+            yield from read_edge_chunks(f, chunk_size, delimiter, comment)
+        return
+
+    items = iter(source)
+    while True:
+        chunk = list(islice(items, chunk_size))
+        if len(chunk) == 0:
+            return
+
+        rows = []
+        for item in chunk:
+            if not isinstance(item, str):
+                rows.append(item)
+                continue
+            line = item.strip()
+            if len(line) == 0 or (comment and line.startswith(comment)):
+                continue
+            if delimiter is None:
+                rows.append(line.split())
+            else:
+                rows.append([field.strip() for field in line.split(delimiter)])
+        yield rows
+
+
+def _write_int64(f, values) -> None:
+    """
+    Writes a sequence of ints as little-endian int64.
+    """
+    if not isinstance(values, array) or values.typecode != 'q':
+        values = array('q', values)
+    if sys.byteorder == 'big':
+        values = array('q', values)
+        values.byteswap()
+    f.write(values.tobytes())
+
+
+def _int64_view(buffer: memoryview, copy: bool):
+    """
+    Returns the little-endian int64 values in buffer, as a memoryview over
+    it when possible, or as an array('q') if a copy is wanted (or needed
+    to fix the byte order).
+    """
+    if not copy and sys.byteorder == 'little':
+        return buffer.cast('q')
+
+    values = array('q')
+    values.frombytes(buffer)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
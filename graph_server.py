@@ -0,0 +1,348 @@
+# Description: asyncio query server for DirectedGraph and UndirectedGraph.
+#
+# The server holds one graph and answers queries over TCP or a Unix socket.
+# The protocol is one JSON object per line in each direction:
+#
+#   request     {"id": 1, "method": "dijkstra", "params": [0]}
+#   response    {"id": 1, "result": [0, 4, Infinity]}  or  {"id": 1, "error": "..."}
+#
+# Responses carry the id of their request and may arrive out of order.
+# Unreachable distances are sent as Infinity, which Python's json reads back
+# as float('inf').
+#
+# Traversals run in a pool of worker processes, each with its own copy of
+# the graph, so the event loop only parses, dispatches and writes. Identical
+# queries that arrive while one is already running share its result instead
+# of computing it again. The graph is served read-only.
+#
+#   python graph_server.py graph.bin --port 8470
+#   python graph_server.py graph.bin --unix /tmp/graph.sock
+#   python graph_server.py --demo       (in-process round trip, see demo())
+
+import argparse
+import asyncio
+import functools
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import graph_io
+from d_graph import DirectedGraph, SparseDirectedGraph
+from ud_graph import UndirectedGraph
+
+# Queries run in the worker pool, by graph kind
+DIRECTED_POOLED = ('dfs', 'bfs', 'dijkstra', 'strongly_connected_components')
+UNDIRECTED_POOLED = ('dfs', 'bfs')
+
+# Queries answered on the event loop: single lookups, or backed by an index
+# the server builds before it starts listening
+DIRECTED_INLINE = ('is_valid_path',)
+UNDIRECTED_INLINE = ('is_valid_path', 'count_connected_components', 'same_component')
+
+
+class GraphServer:
+    """
+    Serves queries on one graph.
+    - workers: size of the process pool (os.cpu_count() if None). With
+      workers=0 the queries run on a thread of the event loop's default
+      executor instead, against the graph itself
+    - source: (graph class, path, mmap) the graph was loaded with.
+      Workers then load the file themselves, memory mapped and sharing its
+      pages, rather than receiving a pickled copy of the graph
+    - coalesced counts the requests answered by a computation that was
+      already running for an identical request
+    """
+
+    def __init__(self, graph, workers=None, source=None):
+        self.graph = graph
+        if isinstance(graph, DirectedGraph):
+            self.pooled, self.inline = DIRECTED_POOLED, DIRECTED_INLINE
+        else:
+            self.pooled, self.inline = UNDIRECTED_POOLED, UNDIRECTED_INLINE
+            graph.count_connected_components()      # Builds the component index now
+
+        if workers is None:
+            workers = os.cpu_count() or 1
+        self.executor = None
+        if workers > 0:
+            initargs = (None, source) if source is not None else (graph, None)
+            self.executor = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=initargs)
+
+        self.coalesced = 0
+        self._running = {}          # Key = (method, params) : Value = future of the computation
+        self._connections = {}      # Key = connection task : Value = its writer
+        self._server = None
+
+    @classmethod
+    def load(cls, path, workers=None, mmap=True):
+        """
+        Loads the graph file at path (directed files as SparseDirectedGraph,
+        undirected ones as UndirectedGraph) and returns a server for it.
+        """
+        graph_class = SparseDirectedGraph
+        if graph_io.read_graph(path, mmap).kind == graph_io.UNDIRECTED:
+            graph_class = UndirectedGraph
+        return cls(graph_class.load(path, mmap), workers, (graph_class, path, mmap))
+
+    async def start(self, host='127.0.0.1', port=0, path=None) -> None:
+        """
+        Starts listening on a Unix socket at path if given, otherwise on
+        host:port (port 0 picks a free port; see address).
+        """
+        if path is not None:
+            self._server = await asyncio.start_unix_server(self._serve, path)
+        else:
+            self._server = await asyncio.start_server(self._serve, host, port)
+
+    @property
+    def address(self):
+        """
+        The (host, port) or socket path the server is listening on.
+        """
+        return self._server.sockets[0].getsockname()
+
+    async def serve_forever(self) -> None:
+        await self._server.serve_forever()
+
+    async def close(self) -> None:
+        """
+        Stops listening, closes open connections and shuts the worker pool down.
+        """
+        if self._server is not None:
+            self._server.close()
+            for writer in self._connections.values():
+                writer.close()
+            await asyncio.gather(*self._connections, return_exceptions=True)
+            await self._server.wait_closed()
+        if self.executor is not None:       # Waits for the workers on a thread, not on the event loop
+            shutdown = functools.partial(self.executor.shutdown, wait=True, cancel_futures=True)
+            await asyncio.get_running_loop().run_in_executor(None, shutdown)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def query(self, method: str, params=()):
+        """
+        Answers one query, as the server does for a request: the result of
+        graph.method(*params). Raises ValueError for methods not served.
+        """
+        params = _freeze(params)
+        if method in self.inline:
+            return getattr(self.graph, method)(*params)
+        if method not in self.pooled:
+            raise ValueError(f"unknown method {method!r}")
+
+        key = (method, params)
+        future = self._running.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+
+        loop = asyncio.get_running_loop()
+        if self.executor is None:
+            future = loop.run_in_executor(None, getattr(self.graph, method), *params)
+        else:
+            future = loop.run_in_executor(self.executor, _run_query, method, params)
+        self._running[key] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            if self._running.get(key) is future:
+                del self._running[key]
+
+    async def _serve(self, reader, writer) -> None:
+        """
+        Handles one connection: every request line is answered by its own
+        task, so a slow query doesn't hold up the ones behind it.
+        """
+        tasks = set()
+        self._connections[asyncio.current_task()] = writer
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ConnectionError:
+                    break
+                if not line:
+                    break
+                task = asyncio.create_task(self._answer(line, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.wait(tasks)
+        finally:
+            del self._connections[asyncio.current_task()]
+            writer.close()
+
+    async def _answer(self, line: bytes, writer) -> None:
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get('id')
+            response = {'id': request_id,
+                        'result': await self.query(request['method'], request.get('params', ()))}
+        except Exception as error:
+            response = {'id': request_id, 'error': f"{type(error).__name__}: {error}"}
+        writer.write(json.dumps(response).encode() + b'\n')
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass                        # Client went away; nothing to answer to
+
+
+class GraphClient:
+    """
+    Client for a GraphServer, for tests and for other asyncio code.
+    Requests can be sent concurrently over the one connection; each call
+    waits for the response with its id.
+    """
+
+    def __init__(self, reader, writer):
+        self._reader = reader
+        self._writer = writer
+        self._next_id = 0
+        self._waiting = {}          # Key = request id : Value = future of its response
+        self._receiver = asyncio.create_task(self._receive())
+
+    @classmethod
+    async def connect(cls, host='127.0.0.1', port=8470, path=None):
+        """
+        Connects to a server on the Unix socket at path if given, otherwise
+        on host:port.
+        """
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def call(self, method: str, *params):
+        """
+        Sends a query and returns its result. Raises RuntimeError with the
+        server's message if the query failed.
+        """
+        self._next_id += 1
+        request_id = self._next_id
+        future = self._waiting[request_id] = asyncio.get_running_loop().create_future()
+        self._writer.write(json.dumps({'id': request_id, 'method': method, 'params': params}).encode() + b'\n')
+        await self._writer.drain()
+
+        response = await future
+        if 'error' in response:
+            raise RuntimeError(response['error'])
+        return response['result']
+
+    async def close(self) -> None:
+        self._writer.close()
+        await self._writer.wait_closed()
+        self._receiver.cancel()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _receive(self) -> None:
+        try:
+            while True:
+                line = await self._reader.readline()
+                if not line:
+                    break
+                response = json.loads(line)
+                future = self._waiting.pop(response['id'], None)
+                if future is not None and not future.done():
+                    future.set_result(response)
+        finally:
+            for future in self._waiting.values():       # Connection closed under them
+                if not future.done():
+                    future.set_exception(ConnectionError("connection to the graph server closed"))
+            self._waiting.clear()
+
+
+def _freeze(params) -> ():
+    """
+    Turns JSON parameters into a hashable tuple, with lists (paths) as tuples.
+    """
+    return tuple(_freeze(p) if isinstance(p, list) else p for p in params)
+
+
+# Graph held by each worker process, set once by _init_worker.
+_worker_graph = None
+
+
+def _init_worker(graph, source) -> None:
+    global _worker_graph
+    if source is not None:
+        graph_class, path, mmap = source
+        graph = graph_class.load(path, mmap)
+    _worker_graph = graph
+
+
+def _run_query(method: str, params: ()):
+    return getattr(_worker_graph, method)(*params)
+
+
+async def demo() -> None:
+    """
+    Serves a small directed and a small undirected graph in-process, with
+    workers=0, and queries them through GraphClient, printing the answers.
+    """
+    directed = DirectedGraph([(0, 1, 10), (4, 0, 12), (1, 4, 15), (4, 3, 3),
+                              (3, 1, 5), (2, 1, 23), (3, 2, 7)])
+    undirected = UndirectedGraph(['AE', 'AC', 'BE', 'CE', 'CD', 'CB', 'BD', 'ED', 'BH', 'QG', 'FG'])
+
+    for graph, start, queries in ((directed, 4, [('dijkstra', 0), ('bfs', 4), ('is_valid_path', [0, 1, 4, 3]),
+                                                 ('strongly_connected_components',)]),
+                                  (undirected, 'A', [('dfs', 'A'), ('count_connected_components',),
+                                                     ('same_component', 'A', 'G'), ('is_valid_path', list('ACDB')),
+                                                     ('remove_edge', 'A', 'E')])):
+        async with GraphServer(graph, workers=0) as server:
+            await server.start()
+            host, port = server.address[:2]
+            async with await GraphClient.connect(host, port) as client:
+                for method, *params in queries:
+                    try:
+                        print(type(graph).__name__, method, params, await client.call(method, *params))
+                    except RuntimeError as error:
+                        print(type(graph).__name__, method, params, 'error:', error)
+
+                # Identical queries sent together may share one computation (see coalesced)
+                results = await asyncio.gather(*(client.call('bfs', start) for _ in range(5)))
+                print(type(graph).__name__, '5 x bfs', [start], all(r == results[0] for r in results))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Serve queries on a graph file written by save().")
+    parser.add_argument('path', nargs='?', help="graph file")
+    parser.add_argument('--demo', action='store_true', help="query two small graphs in-process and exit")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8470)
+    parser.add_argument('--unix', metavar='SOCKET', help="listen on a Unix socket instead of TCP")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: one per CPU)")
+    args = parser.parse_args(argv)
+    if args.demo:
+        asyncio.run(demo())
+        return 0
+    if args.path is None:
+        parser.error("the graph file is required unless --demo is given")
+
+    async def serve():
+        async with GraphServer.load(args.path, args.workers) as server:
+            await server.start(args.host, args.port, args.unix)
+            print(f"Serving {args.path} on {server.address}")
+            await server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
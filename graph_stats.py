@@ -0,0 +1,133 @@
+# Description: Optional per-operation statistics for DirectedGraph and UndirectedGraph.
+#
+# graph.enable_stats() swaps instrumented wrappers in as instance attributes
+# over the graph's public methods, its storage primitives and its heap
+# functions; graph.disable_stats() removes them again. A graph that never
+# enables stats runs the plain class methods, so it pays nothing.
+
+import heapq
+import time
+
+# Counters kept for every graph and for every instrumented method
+COUNTERS = ('vertices_expanded', 'edges_scanned', 'heap_pushes', 'heap_pops', 'stale_entries')
+
+
+class GraphStats:
+    """
+    Counters and wall time collected while stats are enabled on a graph.
+    - totals: each counter summed over everything the graph did
+    - methods: per public method, the number of calls, the total seconds and
+      the counters accumulated during those calls
+    A public method called from inside another one is counted as part of
+    the outer call only.
+    If callback is given, it is called after every public method call with
+    (method name, seconds, dict of counters for that call).
+    """
+
+    def __init__(self, callback=None):
+        self.totals = dict.fromkeys(COUNTERS, 0)
+        self.methods = {}
+        self.callback = callback
+        self.depth = 0              # Number of instrumented calls in progress
+        self.expanding = False      # True while a primitive is running
+
+    def count(self, name: str, amount: int) -> None:
+        """
+        Adds amount to one of the COUNTERS.
+        """
+        self.totals[name] += amount
+
+    def snapshot(self) -> dict:
+        """
+        Returns a copy of the statistics: {'totals': {...}, 'methods': {...}}.
+        """
+        return {'totals': dict(self.totals),
+                'methods': {name: dict(entry) for name, entry in self.methods.items()}}
+
+    def reset(self) -> None:
+        """
+        Sets every counter and timing back to zero.
+        """
+        self.totals = dict.fromkeys(COUNTERS, 0)
+        self.methods = {}
+
+    def _record(self, name: str, seconds: float, counters: dict) -> None:
+        entry = self.methods.get(name)
+        if entry is None:
+            entry = self.methods[name] = dict(calls=0, seconds=0.0, **dict.fromkeys(COUNTERS, 0))
+        entry['calls'] += 1
+        entry['seconds'] += seconds
+        for key, value in counters.items():
+            entry[key] += value
+        if self.callback is not None:
+            self.callback(name, seconds, counters)
+
+
+def instrument(graph, stats: GraphStats, methods, primitives) -> None:
+    """
+    Installs stats on graph: every name in methods gets a timing wrapper,
+    every name in primitives (functions returning the edges of one vertex)
+    a wrapper counting one expanded vertex and the edges it returned, and
+    _heappush/_heappop wrappers counting heap operations. A primitive that
+    calls another one counts once. Code that only reads the storage, not
+    expanding vertices, calls the class's primitives to stay uncounted.
+    """
+    graph._stats = stats
+    for name in methods:
+        setattr(graph, name, _timed(stats, name, getattr(graph, name)))
+    for name in primitives:
+        setattr(graph, name, _expanding(stats, getattr(graph, name)))
+    graph._heappush = _counted(stats, 'heap_pushes', heapq.heappush)
+    graph._heappop = _counted(stats, 'heap_pops', heapq.heappop)
+
+
+def uninstrument(graph, methods, primitives) -> None:
+    """
+    Removes everything instrument() installed, going back to the class methods.
+    """
+    for name in (*methods, *primitives, '_heappush', '_heappop', '_stats'):
+        graph.__dict__.pop(name, None)
+
+
+def _timed(stats: GraphStats, name: str, function):
+    def wrapper(*args, **kwargs):
+        if stats.depth != 0:            # Called from another public method
+            return function(*args, **kwargs)
+
+        before = dict(stats.totals)
+        stats.depth += 1
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - start
+            stats.depth -= 1
+            stats._record(name, seconds, {key: stats.totals[key] - before[key] for key in COUNTERS})
+
+    wrapper.__name__ = name
+    wrapper.__doc__ = function.__doc__
+    return wrapper
+
+
+def _expanding(stats: GraphStats, function):
+    def wrapper(v):
+        if stats.expanding:             # Called from another primitive, which counts it
+            return function(v)
+        stats.expanding = True
+        try:
+            edges = function(v)
+        finally:
+            stats.expanding = False
+        stats.totals['vertices_expanded'] += 1
+        stats.totals['edges_scanned'] += len(edges)
+        return edges
+
+    return wrapper
+
+
+def _counted(stats: GraphStats, counter: str, function):
+    def wrapper(*args):
+        stats.totals[counter] += 1
+        return function(*args)
+
+    return wrapper
@@ -3,7 +3,216 @@
 # Assignment: 6 - undirected Graphs
 # Description: undirected graph class and associated methods.
 
+import sys
+from array import array
 from collections import deque
+from contextlib import contextmanager
+from collections.abc import Mapping
+
+import graph_cache
+import graph_io
+import graph_stats
+from d_graph import BFS_ALPHA, BFS_BETA, INF
+
+# InternedUndirectedGraph path checks scan a neighbour row of up to this
+# many ids; longer rows are turned into a set, once per validator.
+HUB_DEGREE = 16
+
+
+class NeighborSet(dict):
+    """
+    Insertion-ordered set of neighbours used as the values of adj_list.
+    Backed by a dict (values are unused), so membership, add and remove
+    are all O(1) where a list would be O(degree).
+    Prints like the list it replaces.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, vertices=()):
+        super().__init__((v, None) for v in vertices)
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def add(self, v) -> None:
+        self[v] = None
+
+    def remove(self, v) -> None:
+        del self[v]
+
+    def discard(self, v) -> None:
+        self.pop(v, None)
+
+
+class _MappedAdjacency(Mapping):
+    """
+    Read-only stand-in for adj_list over the arrays of a graph file, used by
+    UndirectedGraph.load. Vertex names are found by binary search in the
+    file's name table and neighbour lists are decoded only when asked for,
+    so nothing is deserialized up front.
+    """
+
+    def __init__(self, offsets, targets, names):
+        self.offsets = offsets
+        self.targets = targets
+        self.names = names
+
+    def __getitem__(self, v):
+        i = self.names.index(v)
+        if i < 0:
+            raise KeyError(v)
+        names = self.names
+        return [names[u] for u in self.targets[self.offsets[i]:self.offsets[i + 1]]]
+
+    def __contains__(self, v):
+        return self.names.index(v) >= 0
+
+    def __iter__(self):
+        names = self.names
+        return (names[i] for i in range(len(names)))
+
+    def __len__(self):
+        return len(self.names)
+
+
+class _InternedAdjacency(Mapping):
+    """
+    Read-only adj_list of an InternedUndirectedGraph: translates its integer
+    adjacency back to names, one neighbour list at a time, so the methods
+    of UndirectedGraph that read adj_list work on it unchanged.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, v):
+        return self.graph._neighbors(v)
+
+    def __contains__(self, v):
+        return v in self.graph.ids
+
+    def __iter__(self):
+        names = self.graph.names
+        return (names[i] for i in self.graph._live_ids())
+
+    def __len__(self):
+        return len(self.graph.ids)
+
+
+class _ComponentIndex:
+    """
+    Connected components of an UndirectedGraph, kept up to date as it changes.
+    - union-find over the vertices: adding an edge is a union
+    - each root also keeps the set of its component's members
+    - removing an edge or vertex may split a component, which union-find
+      can't do, so the component is only flagged dirty. A dirty component
+      is recomputed with a BFS over its members the next time a query
+      needs it, and every other component is left alone.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph              # Its neighbours are read during rebuilds
+        self.parent = {}
+        self.members = {}               # Key = root : Value = set of vertices in its component
+        self.dirty = set()              # Roots of components that may have split
+        self.components = 0
+        self._split(list(graph.adj_list))
+
+    def find(self, v):
+        """
+        Returns the root of v's component, compressing the path on the way.
+        """
+        root = v
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[v] != root:
+            self.parent[v], v = root, self.parent[v]
+        return root
+
+    def add_vertex(self, v) -> None:
+        self.parent[v] = v
+        self.members[v] = {v}
+        self.components += 1
+
+    def union(self, u, v) -> None:
+        u_root, v_root = self.find(u), self.find(v)
+        if u_root == v_root:
+            return
+        if len(self.members[u_root]) < len(self.members[v_root]):
+            u_root, v_root = v_root, u_root     # Merge the smaller one into the larger
+
+        self.parent[v_root] = u_root
+        self.members[u_root] |= self.members.pop(v_root)
+        if v_root in self.dirty:
+            self.dirty.discard(v_root)
+            self.dirty.add(u_root)
+        self.components -= 1
+
+    def remove_edge(self, u) -> None:
+        self.dirty.add(self.find(u))    # u and v were in the same component
+
+    def remove_vertex(self, v) -> None:
+        root = self.find(v)
+        members = self.members.pop(root)
+        members.discard(v)
+        self.dirty.discard(root)
+
+        if len(members) == 0:
+            self.components -= 1
+        else:
+            # v may be an inner node of the tree, so point every member
+            # straight at a new root before v is dropped.
+            new_root = next(iter(members))
+            for u in members:
+                self.parent[u] = new_root
+            self.members[new_root] = members
+            self.dirty.add(new_root)
+        del self.parent[v]
+
+    def count(self) -> int:
+        for root in list(self.dirty):
+            self._rebuild(root)
+        return self.components
+
+    def same(self, u, v) -> bool:
+        for w in (u, v):
+            if self.find(w) in self.dirty:
+                self._rebuild(self.find(w))
+        return self.find(u) == self.find(v)
+
+    def _rebuild(self, root) -> None:
+        """
+        Recomputes the components inside one dirty component.
+        """
+        self.dirty.discard(root)
+        self.components -= 1
+        self._split(self.members.pop(root))
+
+    def _split(self, vertices) -> None:
+        """
+        Finds the components among vertices with BFS over the graph and
+        records each as a new union-find tree of depth one.
+        """
+        unseen = set(vertices)
+        for start in vertices:
+            if start not in unseen:
+                continue
+            unseen.discard(start)
+            component = {start}
+            queue = deque([start])
+            while len(queue) != 0:
+                v = queue.popleft()
+                for u in self.graph._neighbors(v):
+                    if u in unseen:
+                        unseen.discard(u)
+                        component.add(u)
+                        queue.append(u)
+            for v in component:
+                self.parent[v] = start
+            self.members[start] = component
+            self.components += 1
+
 
 class UndirectedGraph:
     """
@@ -14,6 +223,34 @@ class UndirectedGraph:
     - vertex names are strings
     """
 
+    # Component index, built by the first count_connected_components() or
+    # same_component() call and maintained by the mutating methods after that.
+    _components = None
+
+    # Public methods timed by enable_stats(), and the primitive whose calls
+    # it counts as expanded vertices and scanned edges
+    _INSTRUMENTED = ('add_vertex', 'add_edge', 'remove_edge', 'remove_vertex', 'get_edges',
+                     'is_valid_path', 'validate_paths', 'dfs', 'bfs', 'bfs_levels',
+                     'count_connected_components', 'same_component', 'has_cycle', 'snapshot',
+                     'apply_batch')
+    _EXPANDING = ('_neighbors',)
+
+    _query_cache = None     # QueryCache while caching is enabled
+    _version = 0            # Incremented by every change to the graph
+
+    # True for snapshots, which share neighbour sets with the graph they
+    # were taken from and so can't change
+    _read_only = False
+
+    # Vertices whose neighbours this graph has copied since it last shared
+    # them with a snapshot, or None if it shares nothing
+    _owned = None
+
+    # Edge changes queued inside batch(), or None outside of one
+    _pending = None
+
+    _stats = None       # GraphStats while stats are enabled
+
     def __init__(self, start_edges=None):
         """
         Store graph info as adjacency list
@@ -41,16 +278,197 @@ class UndirectedGraph:
 
     # ------------------------------------------------------------------ #
 
+    @classmethod
+    def from_edges(cls, edges):
+        """
+        Builds a graph from (u, v) pairs, like cls(edges) does, but fills
+        the adjacency sets directly in one pass instead of calling add_edge
+        for each pair. Gives the same graph as cls(edges).
+        """
+        graph = cls()
+        adj_list = graph.adj_list
+
+        for u, v in edges:
+            if u == v:                  # Loop cannot exist
+                continue
+            u_neighbours = adj_list.get(u)
+            if u_neighbours is None:
+                u_neighbours = adj_list[u] = NeighborSet()
+            v_neighbours = adj_list.get(v)
+            if v_neighbours is None:
+                v_neighbours = adj_list[v] = NeighborSet()
+            u_neighbours[v] = None      # NeighborSet.add, without the method call
+            v_neighbours[u] = None
+
+        return graph
+
+    @classmethod
+    def from_arrays(cls, u, v):
+        """
+        Builds a graph from two parallel sequences of edge endpoints.
+        Same rules as from_edges.
+        """
+        return cls.from_edges(zip(u, v))
+
+    def ingest(self, source, chunk_size=65536, delimiter=None, progress=None, names=None) -> int:
+        """
+        Streams edges from source into the graph, chunk_size edges at a time,
+        so the whole edge list is never held in memory at once.
+        source is anything graph_io.read_edge_chunks accepts: a path or text
+        file with one "u v" edge per line (whitespace separated, or pass
+        delimiter=',' for CSV), or an iterable of lines or of (u, v) rows.
+        Names are interned, so every occurrence of a vertex in the adjacency
+        sets shares one string; the sets still hold names, not integers.
+        If names is a dict, it is filled in with name : integer id, ids
+        given out in order of first appearance, as the edges arrive.
+        InternedUndirectedGraph.ingest stores the ids themselves.
+        progress, if given, is called after each chunk with the number of
+        edges read so far. Returns the number of edges read.
+        """
+        total = 0
+
+        for rows in graph_io.read_edge_chunks(source, chunk_size, delimiter):
+            for row in rows:
+                if len(row) != 2:
+                    raise ValueError(f"expected 2 fields per edge, got {row!r}")
+                u, v = row
+                if isinstance(u, str):
+                    u = sys.intern(u)
+                if isinstance(v, str):
+                    v = sys.intern(v)
+                if names is not None:
+                    names.setdefault(u, len(names))
+                    names.setdefault(v, len(names))
+                self.add_edge(u, v)
+
+            total += len(rows)
+            if progress is not None:
+                progress(total)
+
+        return total
+
+    def save(self, path) -> None:
+        """
+        Writes the graph to path in the binary CSR format of graph_io.
+        Vertex and neighbour order are kept. Vertex names must be strings.
+        """
+        vertices = list(self.adj_list)
+        ids = {v: i for i, v in enumerate(vertices)}
+        offsets = array('q', [0])
+        targets = array('q')
+        for v in vertices:
+            targets.extend(ids[u] for u in self.adj_list[v])
+            offsets.append(len(targets))
+
+        graph_io.write_graph(path, graph_io.UNDIRECTED, len(vertices), offsets, targets, names=vertices)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Reads a graph written by save().
+        With mmap=True the file is memory mapped and adj_list becomes a
+        read-only view over it: queries read the mapped arrays directly,
+        and processes loading the same file share its pages. The first
+        change to the graph copies it into normal neighbour sets.
+        With mmap=False the file is read into neighbour sets right away.
+        """
+        contents = graph_io.read_graph(path, mmap)
+        if contents.kind != graph_io.UNDIRECTED:
+            raise ValueError(f"{path} does not hold an undirected graph")
+
+        graph = cls()
+        graph.adj_list = _MappedAdjacency(contents.offsets, contents.targets, contents.names)
+        if not mmap:
+            graph._writable()
+        return graph
+
+    def enable_stats(self, callback=None) -> None:
+        """
+        Starts collecting statistics on this graph: calls and wall time of
+        each public method, vertices expanded and edges scanned (see
+        graph_stats.GraphStats). callback, if given, is called after every
+        public method call with (method name, seconds, counters of that call).
+        Until this is called the graph runs without any instrumentation.
+        """
+        self.disable_stats()
+        graph_stats.instrument(self, graph_stats.GraphStats(callback), self._INSTRUMENTED, self._EXPANDING)
+
+    def disable_stats(self) -> None:
+        """
+        Stops collecting statistics and drops the ones collected.
+        """
+        graph_stats.uninstrument(self, self._INSTRUMENTED, self._EXPANDING)
+
+    def stats(self) -> dict:
+        """
+        Returns a snapshot of the statistics collected since enable_stats(),
+        or None if stats are not enabled.
+        """
+        if self._stats is None:
+            return None
+        return self._stats.snapshot()
+
+    def enable_cache(self, max_entries=1024, max_bytes=None) -> None:
+        """
+        Starts caching the results of dfs, bfs, bfs_levels and has_cycle,
+        keyed by method and arguments. A cached result is only served while
+        the graph is unchanged; the least recently used ones are evicted
+        past max_entries results or max_bytes bytes (see
+        graph_cache.QueryCache).
+        Cached lists are shared between callers, so don't modify them.
+        """
+        self._query_cache = graph_cache.QueryCache(max_entries, max_bytes)
+
+    def disable_cache(self) -> None:
+        """
+        Stops caching and drops the cached results.
+        """
+        self._query_cache = None
+
+    def cache_info(self) -> dict:
+        """
+        Returns the hit and miss counts and size of the query cache,
+        or None if caching is not enabled.
+        """
+        if self._query_cache is None:
+            return None
+        return self._query_cache.info()
+
+    def snapshot(self):
+        """
+        Returns a read-only copy of the graph as it is now, for readers on
+        other threads while this graph keeps changing. The snapshot shares
+        the neighbour sets, so taking one only copies the vertex table;
+        afterwards this graph copies a vertex's neighbours before it first
+        changes them, and the snapshot never sees the change.
+        Any number of threads can query a snapshot without locks. Changing
+        it raises TypeError. For other processes, save() the snapshot and
+        load() the file memory mapped.
+        """
+        if self._read_only:
+            return self
+
+        graph = self._share()
+        graph._version = self._version
+        graph._read_only = True
+        return graph
+
     def add_vertex(self, v: str) -> None:
         """
         Adds a new vertex to the graph. Name can be any string.
         If a node by the same name already exists in the graph,
         this method does nothing.
         """
+        self._flush_batch()
         if v in self.adj_list:      # Vertex of this name already exists
             return
 
-        self.adj_list[v] = []
+        self._writable()
+        self.adj_list[v] = NeighborSet()
+        self._version += 1
+
+        if self._components is not None:
+            self._components.add_vertex(v)
 
     def add_edge(self, u: str, v: str) -> None:
         """
@@ -59,24 +477,31 @@ class UndirectedGraph:
         If the edge already exists, or if u and v refer to the same vertex
         this method does nothing.
         """
+        if self._defer('add', u, v):
+            return
         if u == v:                  # Loop cannot exist
             return
 
+        self._writable()
         if u not in self.adj_list:  # If either vertex doesn't exist, create it.
             self.add_vertex(u)
         if v not in self.adj_list:
             self.add_vertex(v)
 
-        if v not in self.adj_list[u]:
-            self.adj_list[u].append(v)  # Add the relationships to our dictionary.
-        if u not in self.adj_list[v]:
-            self.adj_list[v].append(u)
+        self._own(u).add(v)         # Add the relationships to our dictionary.
+        self._own(v).add(u)         #   Adding an existing neighbour does nothing.
+        self._version += 1
+
+        if self._components is not None:
+            self._components.union(u, v)
 
     def remove_edge(self, v: str, u: str) -> None:
         """
         Remove edge from the graph. If either/both vertices do not exist,
         or there is no edge between them, this method does nothing.
         """
+        if self._defer('remove', v, u):
+            return
         if u == v:                  # Loop cannot exist
             return
 
@@ -85,24 +510,207 @@ class UndirectedGraph:
         elif v not in self.adj_list[u] or u not in self.adj_list[v]:
             return
 
-        self.adj_list[u].remove(v)  # Add the relationships to our dictionary.
-        self.adj_list[v].remove(u)
+        self._writable()
+        self._own(u).remove(v)      # Remove the relationships from our dictionary.
+        self._own(v).remove(u)
+        self._version += 1
+
+        if self._components is not None:
+            self._components.remove_edge(u)
 
     def remove_vertex(self, v: str) -> None:
         """
         Remove vertex and all connected edges.
         """
+        self._flush_batch()
         if v not in self.adj_list:
             return
 
+        self._writable()
         # Since our graph is undirected, any vertex incident to v
         #   will be included in v's dictionary value.
         #   Thus we take each vertex from this list and remove v
         #   from their incident vertex list.
         for u in self.adj_list[v]:
-            self.adj_list[u].remove(v)
+            self._own(u).remove(v)
 
         del self.adj_list[v]            # Remove v
+        self._version += 1
+
+        if self._components is not None:
+            self._components.remove_vertex(v)
+
+    def apply_batch(self, ops) -> int:
+        """
+        Applies a batch of edge changes and leaves the graph as calling
+        add_edge and remove_edge for each op in order would. Each op is a
+        tuple ('add', u, v) or ('remove', u, v), or a string 'add Q H' /
+        'remove F G' ('add QH' for one letter names, as in the examples
+        at the bottom of this file).
+        Each op is checked against the state the ops before it leave the
+        edge in, so adding an existing edge or removing a missing one does
+        nothing, and an edge added and removed again within the batch is
+        never stored (its vertices still are, as add_edge creates them).
+        The ops are all parsed before anything changes, so a malformed one
+        (ValueError) leaves the graph untouched. The remaining changes are
+        then written in one pass, and the version and component index are
+        updated once. Returns the number of edges that changed.
+        """
+        adj_list = self.adj_list
+        new_vertices = {}           # Vertices the adds create, in order (values unused)
+        changed = {}                # Key = frozenset({u, v}) : Value = (present before, present now, (u, v))
+        for op in ops:
+            command, u, v = _parse_edge_op(op)
+            if u == v:              # Loop cannot exist
+                continue
+            key = frozenset((u, v))
+            entry = changed.get(key)
+            before = entry[0] if entry is not None else self._has_edge(u, v)
+            present = entry[1] if entry is not None else before
+
+            if command == 'add':
+                for w in (u, v):
+                    if w not in adj_list and w not in new_vertices:
+                        new_vertices[w] = None
+                if not present:
+                    changed.pop(key, None)      # Keep the edges in the order they were added
+                    changed[key] = (before, True, (u, v))
+            elif present:
+                changed[key] = (before, False, (u, v))
+
+        added = [ends for before, now, ends in changed.values() if now and not before]
+        removed = [ends for before, now, ends in changed.values() if before and not now]
+        if len(new_vertices) == 0 and len(added) == 0 and len(removed) == 0:
+            return 0
+
+        self._writable()
+        self._apply_edges(list(new_vertices), added, removed)
+        self._version += 1
+
+        if self._components is not None:
+            for v in new_vertices:
+                self._components.add_vertex(v)
+            for u, v in removed:
+                self._components.remove_edge(u)
+            for u, v in added:
+                self._components.union(u, v)
+        return len(added) + len(removed)
+
+    @contextmanager
+    def batch(self):
+        """
+        Context manager that queues every add_edge and remove_edge call made
+        inside it and hands them to apply_batch when it ends:
+
+            with graph.batch():
+                graph.add_edge('A', 'B')
+                graph.remove_edge('C', 'D')
+
+        Queries inside the block see the graph as it was before the block;
+        adding or removing a vertex applies the changes queued so far
+        first. If the block raises, the queued changes are dropped. A
+        nested batch() joins the outer one.
+        """
+        if self._pending is not None:
+            yield self
+            return
+
+        self._pending = []
+        try:
+            yield self
+            ops = self._pending
+        finally:
+            self._pending = None
+        self.apply_batch(ops)
+
+    def _defer(self, command: str, u, v) -> bool:
+        """
+        Queues an edge change while a batch() is open. Returns True if it did.
+        """
+        if self._pending is None:
+            return False
+        self._pending.append((command, u, v))
+        return True
+
+    def _flush_batch(self) -> None:
+        """
+        Applies the edge changes queued by batch() so far, before a vertex
+        is added or removed.
+        """
+        if self._pending:
+            ops, self._pending = self._pending, []
+            self.apply_batch(ops)
+
+    def _has_edge(self, u, v) -> bool:
+        return u in self.adj_list and v in self.adj_list[u]
+
+    def _apply_edges(self, vertices: [], added: [], removed: []) -> None:
+        """
+        Helper method for apply_batch: stores the new vertices and the
+        coalesced edge changes, with no checks.
+        """
+        for v in vertices:
+            self.adj_list[v] = NeighborSet()
+        if self._owned is not None:
+            self._owned.update(vertices)    # New sets aren't shared
+        for u, v in removed:
+            self._own(u).remove(v)
+            self._own(v).remove(u)
+        for u, v in added:
+            self._own(u).add(v)
+            self._own(v).add(u)
+
+    def _writable(self) -> None:
+        """
+        Called before the graph is changed: snapshots can't be, and the
+        read-only adj_list of a memory mapped graph (see load) is swapped
+        for normal neighbour sets.
+        """
+        if self._read_only:
+            raise TypeError("graph snapshots are read-only")
+        if isinstance(self.adj_list, dict):
+            return
+        self.adj_list = {v: NeighborSet(self.adj_list[v]) for v in self.adj_list}
+        self._components = None     # It was built over the old adj_list
+        self._owned = None          # Every set is new
+
+    def _share(self):
+        """
+        Returns a new graph over the same neighbour sets, for snapshot().
+        From then on _own copies a set before it is changed.
+        """
+        graph = type(self)()
+        if isinstance(self.adj_list, dict):
+            graph.adj_list = dict(self.adj_list)
+            self._owned = set()
+        else:
+            graph.adj_list = self.adj_list      # Mapped file, never changed in place
+        return graph
+
+    def _own(self, v: str) -> NeighborSet:
+        """
+        Returns the neighbour set of v for changing, copying it first if
+        a snapshot shares it.
+        """
+        neighbours = self.adj_list[v]
+        if self._owned is not None and v not in self._owned:
+            neighbours = self.adj_list[v] = NeighborSet(neighbours)
+            self._owned.add(v)
+        return neighbours
+
+    def _neighbors(self, v: str):
+        """
+        Returns the neighbours of v, in the order they were added.
+        Traversals read the adjacency through this.
+        """
+        return self.adj_list[v]
+
+    def _degree(self, v: str) -> int:
+        """
+        Returns the number of neighbours of v. Unlike _neighbors, it isn't
+        counted as an expansion when stats are enabled.
+        """
+        return len(self.adj_list[v])
 
     def get_vertices(self) -> []:
         """
@@ -115,59 +723,65 @@ class UndirectedGraph:
         Return list of edges in the graph (any order)
         """
         edges = []
+        done = set()
 
         # Iterate through all edges
         # Each edge is to be a tuple (u, v)
         # Each tuple we make in alphabetical order, because the graph
         #   is undirected. Thus (u, v) is equivalent to (v, u)
-        #   Alphabetized will make it easier for us to check for dupes.
+        # Every edge is seen once from each end. We only keep it the first
+        #   time, i.e. while its other end has not been iterated yet.
         for key in self.adj_list:
             for vertex in self.adj_list[key]:
+                if vertex in done:
+                    continue
                 if key < vertex:
-                    edge = (key, vertex)
+                    edges.append((key, vertex))
                 else:
-                    edge = (vertex, key)
-
-                if edge not in edges:
-                    edges.append(edge)
+                    edges.append((vertex, key))
+            done.add(key)
 
         return edges
 
     def is_valid_path(self, path: []) -> bool:
         """
         Return true if provided path is valid, False otherwise.
+        Each step is a membership test in the neighbour set of the previous
+        vertex, so this is O(len(path)).
         """
-        if len(path) == 0:  # Empty path is valid
-            return True
-
-        if path[0] not in self.get_vertices():  # Ensure the first vertex is valid
-            return False
-
-        valid_edges = self.get_edges()
-        cur_v = None
+        return self._path_validator()(path)
 
-        for u in path:
-            if cur_v is None:   # Assign our start point and continue
-                cur_v = u
-                continue
-
-            # Our edges are paired in alphabetical order when added
-            # Thus to test the edge's validity, it must also be paired
-            # in alphabetical order.
-            # Again, this is irrelevant to an undirected graph.
+    def validate_paths(self, paths) -> []:
+        """
+        Returns a list of is_valid_path(path) for each path in paths.
+        The lookups are bound once for the whole batch rather than per path.
+        """
+        is_valid = self._path_validator()
+        return [is_valid(path) for path in paths]
 
-            if u < cur_v:
-                edge = (u, cur_v)
-            else:
-                edge = (cur_v, u)
+    def _path_validator(self):
+        """
+        Helper method for is_valid_path and validate_paths.
+        Returns a function checking one path against the graph as it is now.
+        """
+        adj_list = self.adj_list
 
-            if edge not in valid_edges:
+        def is_valid(path) -> bool:
+            if len(path) == 0:      # Empty path is valid
+                return True
+            if path[0] not in adj_list:     # Ensure the first vertex is valid
                 return False
 
-            cur_v = u
+            for i in range(1, len(path)):
+                # Loops don't exist, and vertices outside the graph are in
+                # no neighbour set, so this covers both.
+                if path[i] not in adj_list[path[i - 1]]:
+                    return False
+            return True
 
-        return True
+        return is_valid
 
+    @graph_cache.cached
     def dfs(self, v_start, v_end=None) -> []:
         """
         Return list of vertices visited during DFS search
@@ -176,79 +790,168 @@ class UndirectedGraph:
         If the ending vertex is not in the list, it performs the DFS
         as if the end point is None.
         """
-        if v_start not in self.get_vertices():
-            return []
+        return list(self.iter_dfs(v_start, v_end))
 
-        v_visited = []
-        stack = deque()
+    @graph_cache.cached
+    def bfs(self, v_start, v_end=None) -> []:
+        """
+        Return list of vertices visited during BFS search
+        Vertices are picked in alphabetical order
+        If the starting vertex is not in the list, it will return an empty list.
+        If the ending vertex is not in the list, it performs the BFS
+        as if the end point is None.
+        """
+        return list(self.iter_bfs(v_start, v_end))
+
+    def iter_dfs(self, v_start, v_end=None):
+        """
+        Generator version of dfs. Yields the vertices in the same order dfs
+        returns them, so a caller that stops early skips the rest of the search.
+        """
+        if v_start not in self.adj_list:
+            return
 
-        stack.append(v_start)
+        visited = set()
+        stack = [v_start]
 
         while len(stack) != 0:
             v = stack.pop()
             if v == v_end:
-                v_visited.append(v)
-                return v_visited
-
-            if v not in v_visited:      # If v hasn't been visited, push it to the stack, and
-                v_visited.append(v)     #    then push it's neighbours too (in alphabetical order)
-                adjacent = self.adj_list[v]
-                adjacent.sort()
-                adjacent = adjacent[::-1]       # Ensure we explore in alphabetical order
-                for u in adjacent:
-                    stack.append(u)
-
-        return v_visited
+                yield v
+                return
 
+            if v not in visited:        # If v hasn't been visited, visit it, and
+                visited.add(v)          #    then push its unvisited neighbours (in alphabetical order)
+                yield v
+                for u in sorted(self._neighbors(v), reverse=True):   # Ensure we explore in alphabetical order
+                    if u not in visited:
+                        stack.append(u)
 
-    def bfs(self, v_start, v_end=None) -> []:
+    def iter_bfs(self, v_start, v_end=None):
         """
-        Return list of vertices visited during BFS search
-        Vertices are picked in alphabetical order
-        If the starting vertex is not in the list, it will return an empty list.
-        If the ending vertex is not in the list, it performs the BFS
-        as if the end point is None.
+        Generator version of bfs. Yields the vertices in the same order bfs
+        returns them, so a caller that stops early skips the rest of the search.
+        Vertices are marked when queued, so each one is queued at most once.
         """
-        if v_start not in self.get_vertices():
-            return []
+        if v_start not in self.adj_list:
+            return
 
-        v_visited = []
+        queued = {v_start}
         queue = deque()
-
         queue.append(v_start)
 
         while len(queue) != 0:
             v = queue.popleft()
+            yield v
             if v == v_end:
-                v_visited.append(v)
-                return v_visited
+                return
 
-            if v not in v_visited:      # If v hasn't been visited, push it to the stack, and
-                v_visited.append(v)     #    then push it's neighbours too (in alphabetical order)
-                adjacent = self.adj_list[v]
-                adjacent.sort()         # Ensure we explore in alphabetical order
-                for u in adjacent:
-                    if u not in v_visited:
-                        queue.append(u)
+            for u in sorted(self._neighbors(v)):     # Ensure we explore in alphabetical order
+                if u not in queued:
+                    queued.add(u)
+                    queue.append(u)
 
-        return v_visited
-        
+    @graph_cache.cached
+    def bfs_levels(self, v_start, order=False) -> {}:
+        """
+        Level-synchronous BFS from v_start. Returns a dict giving, for every
+        vertex, the number of edges on a shortest path from v_start to it
+        (infinity if it can't be reached), so levels[v] reads the same as
+        for DirectedGraph.bfs_levels.
+        Each level is expanded either top-down (frontier vertices look at
+        their neighbours) or bottom-up (unvisited vertices look through their
+        neighbours for one in the frontier, stopping at the first),
+        whichever checks fewer edges, see BFS_ALPHA and BFS_BETA.
+        With order=True, returns (levels, the list bfs(v_start) returns).
+        That needs bfs order within each level, so every step is top-down.
+        """
+        if v_start not in self.adj_list:
+            levels = dict.fromkeys(self.adj_list, INF)
+            return (levels, []) if order else levels
+
+        neighbors, degree = self._neighbors, self._degree
+        dist = {v_start: 0}
+        frontier = [v_start]
+        visit = [v_start]
+        unvisited = None            # Built by the first bottom-up step
+        edges_to_check = sum(degree(v) for v in self.adj_list)
+        depth = 0
+
+        while len(frontier) != 0:
+            scout_count = sum(degree(v) for v in frontier)
+
+            if not order and scout_count > edges_to_check / BFS_ALPHA:
+                if unvisited is None:
+                    unvisited = [v for v in self.adj_list if v not in dist]
+                while True:         # Bottom-up steps while the frontier is large
+                    old_size = len(frontier)
+                    frontier, unvisited = self._bottom_up_step(dist, unvisited, depth)
+                    depth += 1
+                    if len(frontier) == 0 or (len(frontier) < old_size and
+                                              len(frontier) <= len(self.adj_list) / BFS_BETA):
+                        break
+                continue
+
+            edges_to_check -= scout_count
+            next_frontier = []
+            for v in frontier:      # Top-down step
+                for u in (sorted(neighbors(v)) if order else neighbors(v)):
+                    if u not in dist:
+                        dist[u] = depth + 1
+                        next_frontier.append(u)
+            visit.extend(next_frontier)
+            frontier = next_frontier
+            depth += 1
+
+        levels = {v: dist.get(v, INF) for v in self.adj_list}
+        return (levels, visit) if order else levels
+
+    def _bottom_up_step(self, dist: {}, unvisited: [], depth: int) -> ():
+        """
+        Helper method for bfs_levels. Every vertex of unvisited with a
+        neighbour at distance depth joins the next frontier.
+        Returns the next frontier and the vertices still unvisited.
+        """
+        next_frontier = []
+        still_unvisited = []
+        for v in unvisited:
+            if v in dist:           # Reached by a top-down step since the list was made
+                continue
+            for u in self._neighbors(v):
+                if dist.get(u) == depth:
+                    dist[v] = depth + 1
+                    next_frontier.append(v)
+                    break
+            else:
+                still_unvisited.append(v)
+        return next_frontier, still_unvisited
 
     def count_connected_components(self):
         """
         Return number of connected components in the graph.
+        The first call builds a component index, which add_edge, remove_edge,
+        add_vertex and remove_vertex then keep up to date, so later calls
+        only redo the work for components an edge was removed from.
         """
-        v_unvisited = self.get_vertices()   # Consider all vertices unvisited
-        components = 0
+        if self._components is None:
+            self._components = _ComponentIndex(self)
 
-        while len(v_unvisited) > 0:     # While we still have vertices to visit
-            visited = self.dfs(v_unvisited[0])  # Perform a DFS on the next vertex
-            for v in visited:
-                v_unvisited.remove(v)   # Remove all vertices visited from the DFS
-            components += 1
+        return self._components.count()
 
-        return components
+    def same_component(self, u: str, v: str) -> bool:
+        """
+        Return True if there is a path between u and v, False otherwise
+        (including when either vertex is not in the graph).
+        Uses the same component index as count_connected_components.
+        """
+        if u not in self.adj_list or v not in self.adj_list:
+            return False
+        if self._components is None:
+            self._components = _ComponentIndex(self)
 
+        return self._components.same(u, v)
+
+    @graph_cache.cached
     def has_cycle(self):
         """
         Return True if graph contains a cycle, False otherwise
@@ -296,7 +999,7 @@ class UndirectedGraph:
 
             if v not in v_visited:
                 v_visited.append(v)
-                adjacent = list(self.adj_list[v])
+                adjacent = list(self._neighbors(v))
                 if prev_val is not None and prev_val in adjacent:
                     adjacent.remove(prev_val)   # Remove the first ancestor from the list
                 adjacent.sort()
@@ -312,6 +1015,430 @@ class UndirectedGraph:
 
 
 
+class InternedUndirectedGraph(UndirectedGraph):
+    """
+    Undirected graph that stores vertices as dense integer ids.
+    - ids maps each name to its id and names maps ids back, so each name
+      is stored once however many edges it has
+    - neighbor_ids[i] is an array('i') of the neighbour ids of vertex i,
+      4 bytes per entry instead of a dict slot and a name reference
+    - compact() packs the arrays into two flat ones, offsets and targets
+      (the neighbours of i are targets[offsets[i]:offsets[i + 1]]), which
+      drops the per-vertex objects too; from_edges and load return packed
+      graphs, and the next change unpacks them
+    - a removed vertex leaves its id empty (None) until the next compact(),
+      so vertices keep the order they were added in
+    - adj_list is a read-only view that gives back names, so the string
+      API (add_edge('A', 'B'), dfs('A'), ...) works as for UndirectedGraph
+    Adding or removing an edge scans the neighbour arrays, so it is
+    O(degree) rather than O(1); from_edges builds the arrays in one pass
+    instead. Same rules as UndirectedGraph.
+    """
+
+    def __init__(self, start_edges=None):
+        """
+        Store graph info as integer adjacency arrays
+        """
+        self.ids = {}
+        self.names = []
+        self.neighbor_ids = []
+        self._packed = None
+
+        if start_edges is not None:
+            for u, v in start_edges:
+                self.add_edge(u, v)
+
+    @property
+    def adj_list(self) -> Mapping:
+        return _InternedAdjacency(self)
+
+    @classmethod
+    def from_edges(cls, edges):
+        """
+        Builds the same graph as cls(edges).compact(), but dedupes each
+        vertex's neighbours in a dict as the edges arrive and packs the
+        rows once at the end, rather than scanning the arrays per edge.
+        """
+        ids, names = {}, []
+        rows = []                   # Per vertex a dict of neighbour id : None, in order added
+
+        for u, v in edges:
+            if u == v:              # Loop cannot exist
+                continue
+            u_id = ids.get(u)
+            if u_id is None:
+                u_id = ids[u] = len(names)
+                names.append(u)
+                rows.append({})
+            v_id = ids.get(v)
+            if v_id is None:
+                v_id = ids[v] = len(names)
+                names.append(v)
+                rows.append({})
+            rows[u_id][v_id] = None
+            rows[v_id][u_id] = None
+
+        offsets, targets = array('q', [0]), array('i')
+        for row in rows:
+            targets.extend(row)
+            offsets.append(len(targets))
+
+        graph = cls()
+        graph.ids, graph.names = ids, names
+        graph.neighbor_ids = None
+        graph._packed = (offsets, targets)
+        return graph
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Reads a graph written by save(). The file already numbers the
+        vertices, so its arrays are copied straight into the packed form.
+        """
+        contents = graph_io.read_graph(path, mmap)
+        if contents.kind != graph_io.UNDIRECTED:
+            raise ValueError(f"{path} does not hold an undirected graph")
+
+        graph = cls()
+        graph.names = list(contents.names)
+        graph.ids = {name: i for i, name in enumerate(graph.names)}
+        graph.neighbor_ids = None
+        graph._packed = (array('q', contents.offsets), array('i', contents.targets))
+        return graph
+
+    def ingest(self, source, chunk_size=65536, delimiter=None, progress=None, names=None) -> int:
+        """
+        Same as UndirectedGraph.ingest, but the edges are stored as integer
+        ids from the start: each new name gets the next id as it arrives.
+        Each chunk is deduped in per-vertex sets and its new neighbours are
+        appended to the arrays once, so a hub costs O(degree) per chunk
+        rather than per edge as with add_edge.
+        If names is a dict, it is filled in after each chunk with
+        name : id for the vertices the chunk added, using the graph's ids.
+        """
+        if self._pending is not None:       # Inside batch(): queued edge by edge
+            return super().ingest(source, chunk_size, delimiter, progress, names)
+        total = 0
+        ids = self.ids
+
+        for rows in graph_io.read_edge_chunks(source, chunk_size, delimiter):
+            start = len(self.names)
+            known = {}              # Key = id : Value = set of its neighbour ids, for the ids this chunk touches
+            added = {}              # Key = id : Value = list of neighbour ids this chunk adds, in order
+
+            for row in rows:
+                if len(row) != 2:
+                    raise ValueError(f"expected 2 fields per edge, got {row!r}")
+                u, v = row
+                if u == v:          # Loop cannot exist
+                    continue
+                if isinstance(u, str):
+                    u = sys.intern(u)
+                if isinstance(v, str):
+                    v = sys.intern(v)
+                if u not in ids:
+                    self.add_vertex(u)
+                if v not in ids:
+                    self.add_vertex(v)
+                u_id, v_id = ids[u], ids[v]
+
+                u_known = known.get(u_id)
+                if u_known is None:
+                    u_known = known[u_id] = set(self._row(u_id))
+                if v_id in u_known:
+                    continue
+                u_known.add(v_id)
+                v_known = known.get(v_id)
+                if v_known is None:
+                    v_known = known[v_id] = set(self._row(v_id))
+                v_known.add(u_id)
+                added.setdefault(u_id, []).append(v_id)
+                added.setdefault(v_id, []).append(u_id)
+                if self._components is not None:
+                    self._components.union(u, v)
+
+            if len(added) != 0:
+                self._writable()
+                for i, new_ids in added.items():
+                    self._own_row(i).extend(new_ids)
+                self._version += 1
+
+            if names is not None:
+                for i in range(start, len(self.names)):     # Only the ids new in this chunk
+                    if self.names[i] is not None:
+                        names[self.names[i]] = i
+            total += len(rows)
+            if progress is not None:
+                progress(total)
+
+        return total
+
+    def compact(self):
+        """
+        Packs the adjacency into one offsets and one targets array and
+        renumbers the vertices to fill the ids of removed ones.
+        Vertex and neighbour order are kept. Returns the graph so it can
+        be chained.
+        """
+        if self._packed is not None:
+            return self
+
+        live = [i for i, row in enumerate(self.neighbor_ids) if row is not None]
+        new_id = array('i', [-1]) * len(self.names)
+        for i, old in enumerate(live):
+            new_id[old] = i
+
+        offsets, targets = array('q', [0]), array('i')
+        for old in live:
+            targets.extend(new_id[j] for j in self.neighbor_ids[old])
+            offsets.append(len(targets))
+
+        self.names = [self.names[old] for old in live]
+        self.ids = {name: i for i, name in enumerate(self.names)}
+        self.neighbor_ids = None
+        self._packed = (offsets, targets)
+        return self
+
+    def add_vertex(self, v: str) -> None:
+        self._flush_batch()
+        if v in self.ids:
+            return
+
+        self._writable()
+        self.ids[v] = len(self.names)
+        self.names.append(v)
+        self.neighbor_ids.append(array('i'))
+        self._version += 1
+
+        if self._components is not None:
+            self._components.add_vertex(v)
+
+    def add_edge(self, u: str, v: str) -> None:
+        if self._defer('add', u, v):
+            return
+        if u == v:                  # Loop cannot exist
+            return
+
+        self._writable()
+        self.add_vertex(u)
+        self.add_vertex(v)
+        u_id, v_id = self.ids[u], self.ids[v]
+        if v_id not in self.neighbor_ids[u_id]:
+            self._own_row(u_id).append(v_id)
+            self._own_row(v_id).append(u_id)
+            self._version += 1
+
+        if self._components is not None:
+            self._components.union(u, v)
+
+    def remove_edge(self, v: str, u: str) -> None:
+        if self._defer('remove', v, u):
+            return
+        if u == v or u not in self.ids or v not in self.ids:
+            return
+        u_id, v_id = self.ids[u], self.ids[v]
+        if v_id not in self._row(u_id):
+            return
+
+        self._writable()
+        self._own_row(u_id).remove(v_id)
+        self._own_row(v_id).remove(u_id)
+        self._version += 1
+
+        if self._components is not None:
+            self._components.remove_edge(u)
+
+    def remove_vertex(self, v: str) -> None:
+        self._flush_batch()
+        if v not in self.ids:
+            return
+
+        self._writable()
+        v_id = self.ids.pop(v)
+        for u_id in self.neighbor_ids[v_id]:
+            self._own_row(u_id).remove(v_id)
+        self.neighbor_ids[v_id] = None  # The id stays empty until compact()
+        self.names[v_id] = None
+        self._version += 1
+
+        if self._components is not None:
+            self._components.remove_vertex(v)
+
+    def _writable(self) -> None:
+        """
+        Called before the graph is changed: snapshots can't be, and a packed
+        graph is unpacked into one array per vertex.
+        """
+        if self._read_only:
+            raise TypeError("graph snapshots are read-only")
+        if self._packed is None:
+            return
+        offsets, targets = self._packed
+        self.neighbor_ids = [targets[offsets[i]:offsets[i + 1]] for i in range(len(self.names))]
+        self._packed = None
+        self._owned = None          # Every array is new
+
+    def _share(self):
+        """
+        Returns a new graph over the same neighbour arrays (or packed
+        arrays, which are never changed in place), for snapshot().
+        """
+        graph = type(self)()
+        graph.ids = dict(self.ids)
+        graph.names = list(self.names)
+        graph._packed = self._packed
+        if self.neighbor_ids is None:
+            graph.neighbor_ids = None
+        else:
+            graph.neighbor_ids = list(self.neighbor_ids)
+            self._owned = set()
+        return graph
+
+    def _has_edge(self, u, v) -> bool:
+        u_id, v_id = self.ids.get(u), self.ids.get(v)
+        return u_id is not None and v_id is not None and v_id in self._row(u_id)
+
+    def _apply_edges(self, vertices: [], added: [], removed: []) -> None:
+        ids, names = self.ids, self.names
+        for v in vertices:
+            ids[v] = len(names)
+            names.append(v)
+            self.neighbor_ids.append(array('i'))
+        for u, v in removed:
+            u_id, v_id = ids[u], ids[v]
+            self._own_row(u_id).remove(v_id)
+            self._own_row(v_id).remove(u_id)
+        for u, v in added:
+            u_id, v_id = ids[u], ids[v]
+            self._own_row(u_id).append(v_id)
+            self._own_row(v_id).append(u_id)
+
+    def _own_row(self, i: int):
+        """
+        Returns the neighbour ids of vertex i for changing, copying them
+        first if a snapshot shares them.
+        """
+        row = self.neighbor_ids[i]
+        if self._owned is not None and i not in self._owned:
+            row = self.neighbor_ids[i] = array('i', row)
+            self._owned.add(i)
+        return row
+
+    def _row(self, i: int):
+        """
+        Returns the neighbour ids of vertex i.
+        """
+        if self._packed is not None:
+            offsets, targets = self._packed
+            return targets[offsets[i]:offsets[i + 1]]
+        return self.neighbor_ids[i]
+
+    def _live_ids(self):
+        """
+        Returns the ids in use, in ascending order.
+        """
+        if self._packed is not None:
+            return range(len(self.names))
+        return [i for i, row in enumerate(self.neighbor_ids) if row is not None]
+
+    def _neighbors(self, v: str) -> []:
+        names = self.names
+        return [names[i] for i in self._row(self.ids[v])]
+
+    def _degree(self, v: str) -> int:
+        i = self.ids[v]
+        if self._packed is not None:
+            offsets = self._packed[0]
+            return offsets[i + 1] - offsets[i]
+        return len(self.neighbor_ids[i])
+
+    def _path_validator(self):
+        """
+        Each hop is checked in the shorter of the two neighbour rows, and
+        rows longer than HUB_DEGREE are looked up in a set built the first
+        time the validator meets them, so paths through hubs stay cheap.
+        """
+        ids, row = self.ids, self._row
+        if self._packed is not None:
+            offsets = self._packed[0]
+
+            def degree(i: int) -> int:
+                return offsets[i + 1] - offsets[i]
+        else:
+            neighbor_ids = self.neighbor_ids
+
+            def degree(i: int) -> int:
+                return len(neighbor_ids[i])
+        hubs = {}                   # Key = id of a long row : Value = set of its neighbour ids
+
+        def adjacent(v_id: int, u_id: int) -> bool:
+            if degree(u_id) < degree(v_id):
+                v_id, u_id = u_id, v_id
+            if degree(v_id) <= HUB_DEGREE:
+                return u_id in row(v_id)
+            neighbours = hubs.get(v_id)
+            if neighbours is None:
+                neighbours = hubs[v_id] = set(row(v_id))
+            return u_id in neighbours
+
+        def is_valid(path) -> bool:
+            if len(path) == 0:
+                return True
+            v_id = ids.get(path[0])
+            if v_id is None:
+                return False
+
+            for i in range(1, len(path)):
+                u_id = ids.get(path[i])
+                if u_id is None or not adjacent(v_id, u_id):
+                    return False
+                v_id = u_id
+            return True
+
+        return is_valid
+
+    def get_vertices(self) -> []:
+        names = self.names
+        return [names[i] for i in self._live_ids()]
+
+    def get_edges(self) -> []:
+        """
+        Same edges, in the same order, as UndirectedGraph.get_edges,
+        worked out on ids.
+        """
+        names = self.names
+        edges = []
+        done = bytearray(len(names))
+
+        for i in self._live_ids():
+            v = names[i]
+            for j in self._row(i):
+                if done[j]:
+                    continue
+                u = names[j]
+                edges.append((v, u) if v < u else (u, v))
+            done[i] = 1
+
+        return edges
+
+
+def _parse_edge_op(op) -> ():
+    """
+    Helper for apply_batch. Returns (command, u, v) for an op given as a
+    tuple or a string.
+    """
+    if isinstance(op, str):
+        command, *ends = op.split()
+        if len(ends) == 1 and len(ends[0]) == 2:    # 'add QH'
+            ends = list(ends[0])
+    else:
+        command, *ends = op
+
+    if command not in ('add', 'remove') or len(ends) != 2:
+        raise ValueError(f"expected ('add' or 'remove', u, v), got {op!r}")
+    return command, ends[0], ends[1]
+
+
 if __name__ == '__main__':
 
     print("\nPDF - method add_vertex() / add_edge example 1")
@@ -403,3 +1530,65 @@ if __name__ == '__main__':
         u, v = edge
         g.add_edge(u, v) if command == 'add' else g.remove_edge(u, v)
         print('{:<10}'.format(case), g.has_cycle())
+
+
+    print("\nCUSTOM - InternedUndirectedGraph count_connected_components() after removals")
+    print("----------------------------------------------------------------------------")
+    edges = ['AE', 'AC', 'BE', 'CE', 'CD', 'CB', 'BD', 'ED', 'BH', 'QG', 'FG']
+    g = InternedUndirectedGraph.from_edges(edges)
+    print(g.count_connected_components(), g.same_component('A', 'H'), g.same_component('A', 'Q'))
+    for u, v in ['BH', 'FG', 'AE', 'AC']:
+        g.remove_edge(u, v)
+        print(f'remove {u}{v}', g.count_connected_components(), g.same_component('A', 'H'))
+    g.remove_vertex('C')
+    print('remove C', g.count_connected_components(), g.get_vertices())
+
+
+    print("\nCUSTOM - bfs_levels()")
+    print("---------------------")
+    g = UndirectedGraph(['AE', 'AC', 'BE', 'CE', 'CD', 'CB', 'BD', 'ED', 'BH', 'QG', 'FG'])
+    print(g.bfs_levels('A'))
+    print(g.bfs_levels('A', order=True)[1], g.bfs('A'))
+
+
+    print("\nCUSTOM - apply_batch() and batch()")
+    print("----------------------------------")
+    for graph_class in (UndirectedGraph, InternedUndirectedGraph):
+        g = graph_class(['AB', 'AC', 'BC', 'BD', 'CD', 'CE'])
+        print(g.apply_batch(['add DE', ('remove', 'A', 'B'), 'add AB', 'remove CE', 'add FF']), g.get_edges())
+        with g.batch():
+            g.add_edge('E', 'F')
+            g.remove_edge('B', 'C')
+        print(g.get_edges(), g.count_connected_components())
+
+
+    print("\nCUSTOM - snapshot()")
+    print("-------------------")
+    for graph_class in (UndirectedGraph, InternedUndirectedGraph):
+        g = graph_class(['AB', 'AC', 'BC', 'BD', 'CD', 'CE'])
+        snap = g.snapshot()
+        g.remove_vertex('C')
+        g.add_edge('E', 'F')
+        print(g.get_edges())
+        print(snap.get_edges(), snap.dfs('E'))
+        try:
+            snap.add_edge('A', 'E')
+        except TypeError as error:
+            print('TypeError:', error)
+
+
+    print("\nCUSTOM - save(), load() and ingest()")
+    print("------------------------------------")
+    import os
+    import tempfile
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'graph.bin')
+        UndirectedGraph(['AB', 'AC', 'BC', 'BD', 'CD', 'CE']).save(path)
+        for graph_class in (UndirectedGraph, InternedUndirectedGraph):
+            g = graph_class.load(path)
+            print(graph_class.__name__, g.get_edges(), g.bfs('A'))
+
+    names = {}
+    g = InternedUndirectedGraph()
+    print(g.ingest(['alice bob', 'bob carol', 'carol alice', 'dave erin'], chunk_size=2, names=names))
+    print(names, g.count_connected_components(), g.is_valid_path(['alice', 'carol', 'bob']))